@@ -6,7 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from sqlalchemy import text
 from shared.database import engine, Base
 from database.models import (
-    MarketDataPoint, TradingSignal, Anomaly, Order, 
+    MarketDataPoint, LatestPrice, TradingSignal, Anomaly, Order, 
     Position, Trade, Portfolio, Account
 )
 from shared.logger import setup_logger
@@ -21,6 +21,128 @@ def create_tables():
     logger.info("Tables created successfully")
 
 
+def deduplicate_market_data():
+    """Remove duplicate bars and enforce one row per (symbol, timestamp)."""
+    with engine.connect() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_market_data_symbol_ts'"
+        )).scalar()
+        if exists:
+            return
+        
+        logger.info("Adding unique constraint on market_data (symbol, timestamp)...")
+        result = conn.execute(text("""
+            DELETE FROM market_data a
+            USING market_data b
+            WHERE a.id < b.id
+              AND a.symbol = b.symbol
+              AND a.timestamp = b.timestamp
+        """))
+        logger.info(f"Removed {result.rowcount} duplicate market data rows")
+        
+        conn.execute(text("""
+            ALTER TABLE market_data
+            ADD CONSTRAINT uq_market_data_symbol_ts UNIQUE (symbol, timestamp)
+        """))
+        # The unique index now serves (symbol, timestamp) lookups
+        conn.execute(text("DROP INDEX IF EXISTS idx_market_data_symbol_timestamp"))
+        conn.commit()
+
+
+def migrate_market_data_primary_key():
+    """Widen an existing id-only primary key to (id, timestamp) for the hypertable conversion."""
+    with engine.connect() as conn:
+        primary_key = conn.execute(text("""
+            SELECT c.conname, array_agg(a.attname::text) AS columns
+            FROM pg_constraint c
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+            WHERE c.conrelid = 'market_data'::regclass AND c.contype = 'p'
+            GROUP BY c.conname
+        """)).first()
+        if primary_key is not None and 'timestamp' in primary_key.columns:
+            return
+        
+        logger.info("Migrating market_data primary key to (id, timestamp)...")
+        if primary_key is not None:
+            conn.execute(text(f'ALTER TABLE market_data DROP CONSTRAINT "{primary_key.conname}"'))
+        conn.execute(text("ALTER TABLE market_data ADD PRIMARY KEY (id, timestamp)"))
+        conn.commit()
+
+
+def create_hypertables():
+    """Convert time-series tables to TimescaleDB hypertables with compression."""
+    logger.info("Creating hypertables...")
+    
+    with engine.connect() as conn:
+        available = conn.execute(text(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'"
+        )).scalar()
+        if not available:
+            logger.warning("TimescaleDB extension not available, keeping market_data as a plain table")
+            return
+        
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+        
+        # 7-day chunks let range scans skip whole partitions
+        created = conn.execute(text("""
+            SELECT created FROM create_hypertable(
+                'market_data', 'timestamp',
+                chunk_time_interval => INTERVAL '7 days',
+                if_not_exists => TRUE,
+                migrate_data => TRUE
+            )
+        """)).scalar()
+        
+        if created:
+            # Columnar compression for chunks older than a day, segmented per symbol
+            conn.execute(text("""
+                ALTER TABLE market_data SET (
+                    timescaledb.compress,
+                    timescaledb.compress_segmentby = 'symbol',
+                    timescaledb.compress_orderby = 'timestamp'
+                )
+            """))
+            conn.execute(text(
+                "SELECT add_compression_policy('market_data', INTERVAL '1 day', if_not_exists => TRUE)"
+            ))
+        
+        conn.commit()
+        logger.info("Hypertables created successfully")
+
+
+def create_covering_indexes():
+    """Add the latest-close covering index to existing market_data tables."""
+    with engine.connect() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_md_symbol_ts_close'"
+        )).scalar()
+        if exists:
+            return
+        
+        logger.info("Creating covering index on market_data (symbol, timestamp DESC) INCLUDE (close)...")
+        hypertable = conn.execute(text("""
+            SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'
+        """)).scalar() and conn.execute(text("""
+            SELECT 1 FROM timescaledb_information.hypertables
+            WHERE hypertable_name = 'market_data'
+        """)).scalar()
+        
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if hypertable:
+            # Hypertables reject CONCURRENTLY; build chunk by chunk instead
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_md_symbol_ts_close
+                ON market_data (symbol, timestamp DESC) INCLUDE (close)
+                WITH (timescaledb.transaction_per_chunk)
+            """))
+        else:
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_md_symbol_ts_close
+                ON market_data (symbol, timestamp DESC) INCLUDE (close)
+            """))
+    logger.info("Covering index created successfully")
+
+
 def create_stored_procedures():
     """Create stored procedures for complex operations."""
     logger.info("Creating stored procedures...")
@@ -64,9 +186,12 @@ def create_stored_procedures():
         """))
         
         # Stored procedure: Update portfolio value
+        # Callable directly after a batch of position changes; the trigger
+        # function below wraps it so it runs once per statement, not per row.
         conn.execute(text("""
-            CREATE OR REPLACE FUNCTION update_portfolio_value()
-            RETURNS TRIGGER AS $$
+            DROP FUNCTION IF EXISTS update_portfolio_value() CASCADE;
+            CREATE FUNCTION update_portfolio_value()
+            RETURNS VOID AS $$
             DECLARE
                 v_total_value FLOAT;
                 v_cash FLOAT;
@@ -96,36 +221,117 @@ def create_stored_procedures():
                     (v_total_value - 100000.0) / 100000.0,
                     NOW()
                 );
-                
-                RETURN NEW;
             END;
             $$ LANGUAGE plpgsql;
         """))
         
-        # Stored procedure: Calculate position PnL
+        # Statements that touched no rows (e.g. an UPDATE matching nothing)
+        # are skipped by checking the transition table
         conn.execute(text("""
-            CREATE OR REPLACE FUNCTION calculate_position_pnl(
-                p_symbol VARCHAR
-            ) RETURNS VOID AS $$
+            CREATE OR REPLACE FUNCTION update_portfolio_value_trigger()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM changed_positions) THEN
+                    PERFORM update_portfolio_value();
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """))
+        
+        # Stored procedure: Fill an order in one round trip
+        # Locks the account and position rows, so concurrent fills cannot
+        # lose updates. Cash moves before the position statement so the
+        # positions trigger values the portfolio with the new cash.
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION execute_fill(
+                p_order_id UUID,
+                p_price FLOAT
+            ) RETURNS BOOLEAN AS $$
             DECLARE
-                v_position RECORD;
-                v_unrealized_pnl FLOAT;
+                v_symbol VARCHAR;
+                v_side VARCHAR;
+                v_quantity FLOAT;
+                v_commission FLOAT;
+                v_pnl FLOAT := 0.0;
+                v_position positions%ROWTYPE;
             BEGIN
-                FOR v_position IN 
-                    SELECT * FROM positions WHERE symbol = p_symbol
-                LOOP
-                    v_unrealized_pnl := (v_position.current_price - v_position.average_price) * v_position.quantity;
+                UPDATE orders SET
+                    status = 'FILLED',
+                    filled_quantity = quantity,
+                    average_fill_price = p_price,
+                    filled_at = NOW()
+                WHERE id = p_order_id AND status = 'PENDING'
+                RETURNING symbol, side, quantity INTO v_symbol, v_side, v_quantity;
+                
+                IF NOT FOUND THEN
+                    RETURN FALSE;
+                END IF;
+                
+                -- 0.1% commission
+                v_commission := v_quantity * p_price * 0.001;
+                
+                PERFORM 1 FROM account LIMIT 1 FOR UPDATE;
+                SELECT * INTO v_position FROM positions WHERE symbol = v_symbol FOR UPDATE;
+                
+                -- A sell realizes PnL on the held quantity against its average price
+                IF v_side = 'SELL' AND v_position.id IS NOT NULL THEN
+                    v_pnl := (p_price - v_position.average_price) * LEAST(v_quantity, v_position.quantity);
+                END IF;
+                
+                INSERT INTO trades (id, order_id, symbol, side, quantity, price, commission, pnl, timestamp)
+                VALUES (gen_random_uuid(), p_order_id, v_symbol, v_side, v_quantity, p_price, v_commission, v_pnl, NOW());
+                
+                IF v_side = 'BUY' THEN
+                    UPDATE account SET cash = cash - (v_quantity * p_price + v_commission);
+                    
+                    INSERT INTO positions (id, symbol, quantity, average_price, current_price, unrealized_pnl, realized_pnl)
+                    VALUES (gen_random_uuid(), v_symbol, v_quantity, p_price, p_price, 0.0, 0.0)
+                    ON CONFLICT (symbol) DO UPDATE SET
+                        average_price = (positions.quantity * positions.average_price + EXCLUDED.quantity * p_price)
+                            / (positions.quantity + EXCLUDED.quantity),
+                        quantity = positions.quantity + EXCLUDED.quantity,
+                        current_price = p_price,
+                        last_updated = NOW();
+                ELSE
+                    UPDATE account SET cash = cash + (v_quantity * p_price - v_commission);
                     
-                    UPDATE positions 
-                    SET unrealized_pnl = v_unrealized_pnl,
-                        last_updated = NOW()
-                    WHERE symbol = p_symbol;
-                END LOOP;
+                    IF v_position.id IS NULL THEN
+                        -- No position statement runs, so refresh the value directly
+                        PERFORM update_portfolio_value();
+                    ELSIF v_position.quantity - v_quantity <= 0 THEN
+                        -- Remove position if fully closed
+                        DELETE FROM positions WHERE id = v_position.id;
+                    ELSE
+                        UPDATE positions SET
+                            realized_pnl = realized_pnl + (p_price - average_price) * v_quantity,
+                            quantity = quantity - v_quantity,
+                            current_price = p_price,
+                            last_updated = NOW()
+                        WHERE id = v_position.id;
+                    END IF;
+                END IF;
+                
+                RETURN TRUE;
             END;
             $$ LANGUAGE plpgsql;
         """))
         
+        # Stored procedure: Calculate position PnL
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION calculate_position_pnl(
+                p_symbol VARCHAR
+            ) RETURNS VOID AS $$
+                UPDATE positions
+                SET unrealized_pnl = (current_price - average_price) * quantity,
+                    last_updated = NOW()
+                WHERE symbol = p_symbol;
+            $$ LANGUAGE sql;
+        """))
+        
         # Stored procedure: Get portfolio statistics
+        # Single set-based pass: running peak and per-snapshot returns come from
+        # window functions, so no PL/pgSQL loop over the snapshots is needed.
         conn.execute(text("""
             CREATE OR REPLACE FUNCTION get_portfolio_stats(
                 p_start_date TIMESTAMP,
@@ -136,51 +342,26 @@ def create_stored_procedures():
                 max_drawdown FLOAT,
                 volatility FLOAT
             ) AS $$
-            DECLARE
-                v_returns FLOAT[];
-                v_mean_return FLOAT;
-                v_std_return FLOAT;
-                v_sharpe FLOAT;
-                v_max_dd FLOAT;
-                v_peak FLOAT;
-                v_current FLOAT;
-            BEGIN
-                -- Get returns
-                SELECT ARRAY_AGG(total_return ORDER BY timestamp) INTO v_returns
-                FROM portfolio_snapshots
-                WHERE timestamp BETWEEN p_start_date AND p_end_date;
-                
-                -- Calculate statistics
-                SELECT AVG(r), STDDEV(r) INTO v_mean_return, v_std_return
-                FROM unnest(v_returns) AS r;
-                
-                -- Sharpe ratio (assuming 252 trading days, risk-free rate = 0)
-                IF v_std_return > 0 THEN
-                    v_sharpe := (v_mean_return * 252) / (v_std_return * SQRT(252));
-                ELSE
-                    v_sharpe := 0;
-                END IF;
-                
-                -- Max drawdown
-                v_peak := 0;
-                v_max_dd := 0;
-                FOR i IN 1..array_length(v_returns, 1) LOOP
-                    v_current := v_returns[i];
-                    IF v_current > v_peak THEN
-                        v_peak := v_current;
-                    END IF;
-                    IF (v_peak - v_current) > v_max_dd THEN
-                        v_max_dd := v_peak - v_current;
-                    END IF;
-                END LOOP;
-                
-                RETURN QUERY SELECT 
-                    v_returns[array_length(v_returns, 1)] as total_return,
-                    v_sharpe as sharpe_ratio,
-                    v_max_dd as max_drawdown,
-                    v_std_return * SQRT(252) as volatility;
-            END;
-            $$ LANGUAGE plpgsql;
+                WITH snapshots AS (
+                    SELECT
+                        s.total_value,
+                        s.total_return,
+                        MAX(s.total_value) OVER w AS peak,
+                        s.total_value / NULLIF(LAG(s.total_value) OVER w, 0) - 1 AS r,
+                        ROW_NUMBER() OVER (ORDER BY s.timestamp DESC) AS rn_desc
+                    FROM portfolio_snapshots s
+                    WHERE s.timestamp BETWEEN p_start_date AND p_end_date
+                    WINDOW w AS (ORDER BY s.timestamp ROWS UNBOUNDED PRECEDING)
+                )
+                SELECT
+                    MAX(snapshots.total_return) FILTER (WHERE rn_desc = 1),
+                    -- Sharpe ratio (assuming 252 trading days, risk-free rate = 0)
+                    COALESCE(AVG(r) * 252 / NULLIF(STDDEV(r) * SQRT(252), 0), 0),
+                    -- Max drawdown relative to the running peak of total value
+                    COALESCE(MAX((peak - snapshots.total_value) / NULLIF(peak, 0)), 0),
+                    STDDEV(r) * SQRT(252)
+                FROM snapshots;
+            $$ LANGUAGE sql STABLE;
         """))
         
         conn.commit()
@@ -192,13 +373,31 @@ def create_triggers():
     logger.info("Creating database triggers...")
     
     with engine.connect() as conn:
-        # Trigger: Update portfolio value when position changes
+        # Trigger: Update portfolio value once per statement that changes positions.
+        # Transition tables are only allowed on single-event triggers, hence three.
         conn.execute(text("""
             DROP TRIGGER IF EXISTS trigger_update_portfolio_value ON positions;
-            CREATE TRIGGER trigger_update_portfolio_value
-            AFTER INSERT OR UPDATE OR DELETE ON positions
-            FOR EACH ROW
-            EXECUTE FUNCTION update_portfolio_value();
+            
+            DROP TRIGGER IF EXISTS trigger_update_portfolio_value_insert ON positions;
+            CREATE TRIGGER trigger_update_portfolio_value_insert
+            AFTER INSERT ON positions
+            REFERENCING NEW TABLE AS changed_positions
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION update_portfolio_value_trigger();
+            
+            DROP TRIGGER IF EXISTS trigger_update_portfolio_value_update ON positions;
+            CREATE TRIGGER trigger_update_portfolio_value_update
+            AFTER UPDATE ON positions
+            REFERENCING NEW TABLE AS changed_positions
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION update_portfolio_value_trigger();
+            
+            DROP TRIGGER IF EXISTS trigger_update_portfolio_value_delete ON positions;
+            CREATE TRIGGER trigger_update_portfolio_value_delete
+            AFTER DELETE ON positions
+            REFERENCING OLD TABLE AS changed_positions
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION update_portfolio_value_trigger();
         """))
         
         # Trigger: Validate order before insertion
@@ -229,6 +428,41 @@ def create_triggers():
             EXECUTE FUNCTION validate_order();
         """))
         
+        # Trigger: Keep latest_market_data at the newest bar per symbol.
+        # Row-level because hypertables do not support transition tables;
+        # each insert touches one row of a table sized by the symbol count.
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION update_latest_market_data()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                INSERT INTO latest_market_data (symbol, close, timestamp)
+                VALUES (NEW.symbol, NEW.close, NEW.timestamp)
+                ON CONFLICT (symbol) DO UPDATE SET
+                    close = EXCLUDED.close,
+                    timestamp = EXCLUDED.timestamp
+                WHERE latest_market_data.timestamp <= EXCLUDED.timestamp;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """))
+        
+        conn.execute(text("""
+            DROP TRIGGER IF EXISTS trigger_update_latest_market_data ON market_data;
+            CREATE TRIGGER trigger_update_latest_market_data
+            AFTER INSERT ON market_data
+            FOR EACH ROW
+            EXECUTE FUNCTION update_latest_market_data();
+        """))
+        
+        # Backfill symbols that already have bars
+        conn.execute(text("""
+            INSERT INTO latest_market_data (symbol, close, timestamp)
+            SELECT DISTINCT ON (symbol) symbol, close, timestamp
+            FROM market_data
+            ORDER BY symbol, timestamp DESC
+            ON CONFLICT (symbol) DO NOTHING
+        """))
+        
         conn.commit()
         logger.info("Triggers created successfully")
 
@@ -260,6 +494,10 @@ def init_database():
     logger.info("Initializing database...")
     try:
         create_tables()
+        deduplicate_market_data()
+        migrate_market_data_primary_key()
+        create_hypertables()
+        create_covering_indexes()
         create_stored_procedures()
         create_triggers()
         initialize_account()
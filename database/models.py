@@ -1,7 +1,7 @@
 """SQLAlchemy database models."""
 from sqlalchemy import (
     Column, Integer, Float, String, DateTime, Boolean, 
-    ForeignKey, Index, CheckConstraint, Text, func
+    ForeignKey, Index, CheckConstraint, UniqueConstraint, Text, func
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -16,7 +16,8 @@ class MarketDataPoint(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     symbol = Column(String(10), nullable=False, index=True)
-    timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Part of the primary key: hypertable unique indexes must include the time column
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     open = Column(Float, nullable=False)
     high = Column(Float, nullable=False)
     low = Column(Float, nullable=False)
@@ -26,11 +27,31 @@ class MarketDataPoint(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     __table_args__ = (
-        Index('idx_market_data_symbol_timestamp', 'symbol', 'timestamp'),
-        Index('idx_market_data_timestamp', 'timestamp'),
+        UniqueConstraint('symbol', 'timestamp', name='uq_market_data_symbol_ts'),
+        # Rows arrive in time order, so a BRIN range index stays small and selective
+        Index(
+            'idx_market_data_ts_brin', 'timestamp',
+            postgresql_using='brin',
+            postgresql_with={'pages_per_range': 32}
+        ),
+        # Covering index so latest-close lookups are index-only scans
+        Index(
+            'ix_md_symbol_ts_close', 'symbol', 'timestamp',
+            postgresql_ops={'timestamp': 'DESC'},
+            postgresql_include=['close']
+        ),
     )
 
 
+class LatestPrice(Base):
+    """Latest close per symbol, kept current by a trigger on market_data."""
+    __tablename__ = "latest_market_data"
+    
+    symbol = Column(String(10), primary_key=True)
+    close = Column(Float, nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+
+
 class TradingSignal(Base):
     """Trading signals from ML service."""
     __tablename__ = "trading_signals"
@@ -123,7 +144,8 @@ class Portfolio(Base):
     """Portfolio snapshots."""
     __tablename__ = "portfolio_snapshots"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Server-side default as well, since snapshots are written by update_portfolio_value()
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=func.gen_random_uuid())
     total_value = Column(Float, nullable=False)
     cash = Column(Float, nullable=False)
     total_pnl = Column(Float, default=0.0)
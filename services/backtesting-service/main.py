@@ -1,30 +1,72 @@
 """Backtesting Service - Historical strategy testing."""
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Counter
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
 import uvicorn
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Optional, List
+from numba import njit
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
 from sqlalchemy import text
+from sqlalchemy.orm import Session
 from shared.config import settings
 from shared.logger import setup_logger
-from shared.database import get_db_session
-from shared.models import BacktestResult
-from database.models import MarketDataPoint
+from shared.database import get_session
+from shared.models import BacktestResult, utc_now
 import yfinance as yf
 
 logger = setup_logger(__name__)
 
+# Global process pool for CPU-bound backtest runs
+backtest_executor = None
+
+HISTORY_STORE_FAILURES = Counter(
+    "backtest_history_store_failures_total",
+    "Fetched price histories that could not be written back to market_data"
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown events."""
+    global backtest_executor
+    
+    # Shared model schemas are deferred; build the one this service serves up front
+    BacktestResult.model_rebuild()
+    
+    # Compile the Numba kernels now instead of inside the first request
+    warm_up_kernels()
+    backtest_executor = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        initializer=warm_up_kernels
+    )
+    logger.info("Backtesting service started")
+    
+    yield
+    
+    if backtest_executor:
+        backtest_executor.shutdown(cancel_futures=True)
+    logger.info("Backtesting service stopped")
+
+
 app = FastAPI(
     title="Backtesting Service",
     description="Backtesting service for strategy testing",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -40,25 +82,109 @@ app.add_middleware(
 Instrumentator().instrument(app).expose(app)
 
 
-def calculate_sharpe_ratio(returns: pd.Series, risk_free_rate: float = 0.0) -> float:
-    """Calculate Sharpe ratio."""
-    if len(returns) == 0 or returns.std() == 0:
-        return 0.0
-    
-    excess_returns = returns - risk_free_rate / 252
-    sharpe = np.sqrt(252) * excess_returns.mean() / returns.std()
-    return float(sharpe)
+# Strategy action codes used in the precomputed signal arrays
+ACTION_HOLD = 0
+ACTION_BUY = 1
+ACTION_SELL = 2
+
+COMMISSION_RATE = 0.001  # 0.1% commission
 
 
-def calculate_max_drawdown(equity_curve: pd.Series) -> float:
-    """Calculate maximum drawdown."""
+@njit(cache=True)
+def calculate_max_drawdown(equity_curve: np.ndarray) -> float:
+    """Calculate maximum drawdown in one pass, without running-max temporaries."""
+    max_drawdown = 0.0
     if len(equity_curve) == 0:
-        return 0.0
+        return max_drawdown
+    
+    peak = equity_curve[0]
+    for i in range(1, len(equity_curve)):
+        value = equity_curve[i]
+        if value > peak:
+            peak = value
+        elif peak != 0:
+            drawdown = (peak - value) / peak
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+    return max_drawdown
+
+
+@njit(cache=True)
+def run_backtest_core(
+    close: np.ndarray,
+    actions: np.ndarray,
+    quantities: np.ndarray,
+    initial_capital: float
+):
+    """Walk the signal arrays, filling orders that the account can afford.
+    
+    Returns the equity curve, its annualized Sharpe ratio (risk-free rate 0)
+    and the bar index, side and quantity of every filled trade. Per-bar
+    returns are folded into a Welford mean/variance as the curve is built.
+    Prices are read as float32; cash, position and equity accumulate in
+    float64 so they do not drift.
+    """
+    n = len(close)
+    equity_curve = np.empty(n, dtype=np.float64)
+    trades_idx = np.empty(n, dtype=np.int64)
+    trades_side = np.empty(n, dtype=np.int8)
+    trades_qty = np.empty(n, dtype=np.float64)
+    n_trades = 0
+    cash = initial_capital
+    position = 0.0
+    n_returns = 0
+    mean_return = 0.0
+    m2 = 0.0
+    
+    if n > 0:
+        equity_curve[0] = initial_capital
+    
+    for i in range(1, n):
+        action = actions[i]
+        quantity = quantities[i]
+        price = close[i]
+        
+        if action == ACTION_BUY and quantity > 0:
+            total_cost = quantity * price * (1 + COMMISSION_RATE)
+            if cash >= total_cost:
+                cash -= total_cost
+                position += quantity
+                trades_idx[n_trades] = i
+                trades_side[n_trades] = ACTION_BUY
+                trades_qty[n_trades] = quantity
+                n_trades += 1
+        
+        elif action == ACTION_SELL and quantity > 0:
+            if position >= quantity:
+                cash += quantity * price * (1 - COMMISSION_RATE)
+                position -= quantity
+                trades_idx[n_trades] = i
+                trades_side[n_trades] = ACTION_SELL
+                trades_qty[n_trades] = quantity
+                n_trades += 1
+        
+        equity_curve[i] = cash + position * price
+        
+        previous = equity_curve[i - 1]
+        if previous != 0:
+            r = (equity_curve[i] - previous) / previous
+            n_returns += 1
+            delta = r - mean_return
+            mean_return += delta / n_returns
+            m2 += delta * (r - mean_return)
+    
+    sharpe_ratio = 0.0
+    if n_returns > 1 and m2 > 0:
+        std = np.sqrt(m2 / (n_returns - 1))
+        sharpe_ratio = np.sqrt(252) * mean_return / std
     
-    running_max = equity_curve.expanding().max()
-    drawdown = (equity_curve - running_max) / running_max
-    max_drawdown = abs(drawdown.min())
-    return float(max_drawdown)
+    return (
+        equity_curve,
+        sharpe_ratio,
+        trades_idx[:n_trades],
+        trades_side[:n_trades],
+        trades_qty[:n_trades]
+    )
 
 
 def backtest_strategy(
@@ -66,95 +192,58 @@ def backtest_strategy(
     initial_capital: float,
     strategy_func
 ) -> dict:
-    """Run backtest on historical data."""
-    capital = initial_capital
-    cash = initial_capital
-    positions = {}  # symbol -> quantity
-    trades = []
-    equity_curve = [initial_capital]
-    
-    for i in range(1, len(data)):
-        current_data = data.iloc[:i+1]
-        current_price = data.iloc[i]['close']
-        current_date = data.index[i]
-        
-        # Get signal from strategy
-        signal = strategy_func(current_data, i)
-        
-        if signal:
-            action = signal.get('action')
-            symbol = signal.get('symbol', 'STOCK')
-            quantity = signal.get('quantity', 0)
-            confidence = signal.get('confidence', 1.0)
-            
-            if action == 'BUY' and quantity > 0:
-                cost = quantity * current_price
-                commission = cost * 0.001  # 0.1% commission
-                total_cost = cost + commission
-                
-                if cash >= total_cost:
-                    cash -= total_cost
-                    if symbol in positions:
-                        positions[symbol] += quantity
-                    else:
-                        positions[symbol] = quantity
-                    
-                    trades.append({
-                        'date': current_date,
-                        'action': 'BUY',
-                        'quantity': quantity,
-                        'price': current_price,
-                        'commission': commission
-                    })
-            
-            elif action == 'SELL' and quantity > 0:
-                if symbol in positions and positions[symbol] >= quantity:
-                    revenue = quantity * current_price
-                    commission = revenue * 0.001
-                    net_revenue = revenue - commission
-                    
-                    cash += net_revenue
-                    positions[symbol] -= quantity
-                    
-                    if positions[symbol] <= 0:
-                        del positions[symbol]
-                    
-                    trades.append({
-                        'date': current_date,
-                        'action': 'SELL',
-                        'quantity': quantity,
-                        'price': current_price,
-                        'commission': commission
-                    })
-        
-        # Calculate current portfolio value
-        positions_value = sum(positions.get(s, 0) * current_price for s in positions)
-        total_value = cash + positions_value
-        equity_curve.append(total_value)
+    """Run backtest on historical data.
+    
+    The strategy is evaluated once over the whole close series and the
+    path-dependent fill/equity pass runs in a compiled kernel.
+    """
+    close = data['close'].to_numpy(dtype=np.float32)
+    
+    # Get signals for every bar from the strategy
+    actions, quantities = strategy_func(close)
+    
+    return backtest_signals(data, initial_capital, actions, quantities)
+
+
+def backtest_signals(
+    data: pd.DataFrame,
+    initial_capital: float,
+    actions: np.ndarray,
+    quantities: np.ndarray
+) -> dict:
+    """Run backtest on historical data with precomputed per-bar signals."""
+    close = data['close'].to_numpy(dtype=np.float64)
+    
+    # The kernel streams float32 prices; cash and equity stay float64
+    equity_curve, sharpe_ratio, trades_idx, trades_side, trades_qty = run_backtest_core(
+        close.astype(np.float32), actions, quantities, float(initial_capital)
+    )
+    
+    trades = [
+        {
+            'date': data.index[i],
+            'action': 'BUY' if side == ACTION_BUY else 'SELL',
+            'quantity': float(quantity),
+            'price': float(close[i]),
+            'commission': float(quantity * close[i] * COMMISSION_RATE)
+        }
+        for i, side, quantity in zip(trades_idx, trades_side, trades_qty)
+    ]
     
     # Calculate final metrics
-    final_capital = equity_curve[-1]
+    final_capital = float(equity_curve[-1])
     total_return = (final_capital - initial_capital) / initial_capital
     
-    # Calculate returns
-    equity_series = pd.Series(equity_curve)
-    returns = equity_series.pct_change().dropna()
-    
-    sharpe_ratio = calculate_sharpe_ratio(returns)
-    max_drawdown = calculate_max_drawdown(equity_series)
+    sharpe_ratio = float(sharpe_ratio)
+    max_drawdown = float(calculate_max_drawdown(equity_curve))
     
     # Trade statistics
-    if trades:
-        winning_trades = [t for t in trades if t.get('pnl', 0) > 0]
-        losing_trades = [t for t in trades if t.get('pnl', 0) < 0]
-        
-        win_rate = len(winning_trades) / len(trades) if trades else 0
-        avg_win = np.mean([t.get('pnl', 0) for t in winning_trades]) if winning_trades else 0
-        avg_loss = np.mean([t.get('pnl', 0) for t in losing_trades]) if losing_trades else 0
-    else:
-        win_rate = 0
-        avg_win = 0
-        avg_loss = 0
+    winning_trades = [t for t in trades if t.get('pnl', 0) > 0]
+    losing_trades = [t for t in trades if t.get('pnl', 0) < 0]
+    
+    win_rate = len(winning_trades) / len(trades) if trades else 0
+    avg_win = np.mean([t.get('pnl', 0) for t in winning_trades]) if winning_trades else 0
+    avg_loss = np.mean([t.get('pnl', 0) for t in losing_trades]) if losing_trades else 0
     
     return {
         'initial_capital': initial_capital,
@@ -164,8 +253,8 @@ def backtest_strategy(
         'max_drawdown': max_drawdown,
         'win_rate': win_rate,
         'total_trades': len(trades),
-        'winning_trades': len(winning_trades) if trades else 0,
-        'losing_trades': len(losing_trades) if trades else 0,
+        'winning_trades': len(winning_trades),
+        'losing_trades': len(losing_trades),
         'average_win': avg_win,
         'average_loss': avg_loss,
         'equity_curve': equity_curve,
@@ -173,39 +262,220 @@ def backtest_strategy(
     }
 
 
-def simple_momentum_strategy(data: pd.DataFrame, current_idx: int) -> Optional[dict]:
-    """Simple momentum strategy for backtesting."""
-    if current_idx < 20:
-        return None
+@njit(cache=True)
+def momentum_signals(
+    close: np.ndarray,
+    short: int = 10,
+    long: int = 20,
+    position_value: float = 10000.0,
+    sell_quantity: float = 100.0
+):
+    """Moving average crossover signals in a single pass.
     
-    # Calculate moving averages
-    short_ma = data['close'].rolling(window=10).mean().iloc[current_idx]
-    long_ma = data['close'].rolling(window=20).mean().iloc[current_idx]
-    current_price = data['close'].iloc[current_idx]
+    Both moving averages are kept as running sums, so each bar costs two adds
+    and two subtracts regardless of window length. The sums are float64 even
+    when the close array is float32.
+    """
+    n = len(close)
+    actions = np.zeros(n, dtype=np.int8)  # ACTION_HOLD
+    quantities = np.zeros(n, dtype=np.float64)
+    sum_s = 0.0
+    sum_l = 0.0
     
-    # Buy signal: short MA crosses above long MA
-    if short_ma > long_ma:
-        # Calculate position size (10% of portfolio)
-        portfolio_value = 100000  # Simplified
-        position_value = portfolio_value * 0.1
-        quantity = position_value / current_price
+    for i in range(n):
+        sum_s += close[i]
+        sum_l += close[i]
+        if i >= short:
+            sum_s -= close[i - short]
+        if i >= long:
+            sum_l -= close[i - long]
         
-        return {
-            'action': 'BUY',
-            'quantity': round(quantity, 2),
-            'confidence': 0.7
-        }
+        if i < long:
+            continue
+        
+        short_ma = sum_s / short
+        long_ma = sum_l / long
+        
+        # Buy signal: short MA crosses above long MA
+        if short_ma > long_ma:
+            actions[i] = ACTION_BUY
+            quantities[i] = round(position_value / close[i], 2)
+        # Sell signal: short MA crosses below long MA
+        elif short_ma < long_ma:
+            actions[i] = ACTION_SELL
+            quantities[i] = sell_quantity
     
-    # Sell signal: short MA crosses below long MA
-    elif short_ma < long_ma:
-        # Sell all positions
-        return {
-            'action': 'SELL',
-            'quantity': 100,  # Simplified
-            'confidence': 0.7
-        }
+    return actions, quantities
+
+
+# Momentum signals computed by Postgres with sliding-window aggregates, so the
+# moving averages never leave the database. Mirrors momentum_signals.
+MOMENTUM_SIGNALS_SQL = text("""
+    WITH mas AS (
+        SELECT
+            timestamp, open, high, low, close, volume,
+            AVG(close) OVER w10 AS ma10,
+            AVG(close) OVER w20 AS ma20,
+            ROW_NUMBER() OVER w20 AS rn
+        FROM market_data
+        WHERE symbol = :symbol
+          AND timestamp BETWEEN :start_date AND :end_date
+        WINDOW
+            w10 AS (ORDER BY timestamp ROWS 9 PRECEDING),
+            w20 AS (ORDER BY timestamp ROWS 19 PRECEDING)
+    )
+    SELECT
+        timestamp, open, high, low, close, volume,
+        CASE
+            WHEN rn <= 20 THEN 0
+            WHEN ma10 > ma20 THEN 1
+            WHEN ma10 < ma20 THEN 2
+            ELSE 0
+        END AS action,
+        CASE
+            WHEN rn <= 20 THEN 0
+            WHEN ma10 > ma20 THEN ROUND((10000.0 / close)::numeric, 2)::float8
+            WHEN ma10 < ma20 THEN 100
+            ELSE 0
+        END AS quantity
+    FROM mas
+    ORDER BY timestamp
+""")
+
+
+def simple_momentum_strategy(close: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Simple momentum strategy for backtesting.
+    
+    Returns per-bar action codes and order quantities for the whole series.
+    """
+    # Calculate position size (10% of portfolio)
+    portfolio_value = 100000  # Simplified
+    position_value = portfolio_value * 0.1
+    
+    return momentum_signals(close, 10, 20, position_value, 100.0)
+
+
+def warm_up_kernels():
+    """JIT-compile the backtest kernels for the dtypes the service uses.
+    
+    With cache=True the machine code is written to __pycache__, so pool
+    workers and restarts load it from disk instead of recompiling.
+    """
+    close = np.linspace(100.0, 110.0, 32, dtype=np.float32)
+    actions, quantities = simple_momentum_strategy(close)
+    equity_curve = run_backtest_core(close, actions, quantities, 100000.0)[0]
+    calculate_max_drawdown(equity_curve)
+
+
+@lru_cache(maxsize=32)
+def fetch_history(symbol: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Fetch daily history from yfinance, cached in memory and as parquet on disk."""
+    cache_dir = Path(settings.yfinance_cache_dir)
+    path = cache_dir / f"{symbol}_{start_date.date()}_{end_date.date()}.parquet"
+    if path.exists():
+        return pd.read_parquet(path)
+    
+    logger.info(f"Fetching data from yfinance for {symbol}")
+    ticker = yf.Ticker(symbol)
+    hist_data = ticker.history(start=start_date, end=end_date)
+    
+    # Only persist closed ranges; a range reaching today is still filling in
+    if not hist_data.empty and end_date.date() < utc_now().date():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        hist_data.to_parquet(path)
     
-    return None
+    return hist_data
+
+
+def store_history(db: Session, symbol: str, df: pd.DataFrame):
+    """Bulk-load fetched bars into market_data so later backtests use the database.
+    
+    Rows are streamed with COPY into a temporary staging table and merged with
+    INSERT ... ON CONFLICT DO NOTHING, all in one transaction. A failure is
+    logged and counted, and the caller carries on with the fetched data.
+    """
+    # Plain Python values; psycopg does not adapt NumPy integer scalars
+    rows = zip(
+        df.index.to_pydatetime(),
+        df['open'].tolist(),
+        df['high'].tolist(),
+        df['low'].tolist(),
+        df['close'].tolist(),
+        df['volume'].to_numpy(dtype=np.int64).tolist()
+    )
+    
+    try:
+        db.execute(text("""
+            CREATE TEMP TABLE market_data_staging (
+                symbol VARCHAR(10),
+                timestamp TIMESTAMPTZ,
+                open FLOAT,
+                high FLOAT,
+                low FLOAT,
+                close FLOAT,
+                volume INTEGER
+            ) ON COMMIT DROP
+        """))
+        cursor = db.connection().connection.cursor()
+        with cursor.copy(
+            "COPY market_data_staging (symbol, timestamp, open, high, low, close, volume) FROM STDIN"
+        ) as copy:
+            for timestamp, open_, high, low, close, volume in rows:
+                copy.write_row((symbol, timestamp, open_, high, low, close, volume))
+        db.execute(text("""
+            INSERT INTO market_data (id, symbol, timestamp, open, high, low, close, volume)
+            SELECT gen_random_uuid(), symbol, timestamp, open, high, low, close, volume
+            FROM market_data_staging
+            ON CONFLICT (symbol, timestamp) DO NOTHING
+        """))
+        db.commit()
+    except Exception as e:
+        # Storing is opportunistic: the backtest already has its data
+        db.rollback()
+        HISTORY_STORE_FAILURES.inc()
+        logger.error(f"Error storing fetched history for {symbol}: {e}")
+
+
+def load_backtest_data(
+    db: Session,
+    symbol: str,
+    start_date: datetime,
+    end_date: datetime,
+    signals_query
+) -> Tuple[pd.DataFrame, Optional[np.ndarray], Optional[np.ndarray]]:
+    """Load bars for a backtest, with per-bar signals when they come from the database.
+    
+    Falls back to yfinance when the database has fewer than 50 bars; the
+    signals are then None and the strategy computes them.
+    """
+    df = pd.read_sql(
+        signals_query,
+        db.connection(),
+        params={"symbol": symbol, "start_date": start_date, "end_date": end_date},
+        index_col='timestamp'
+    )
+    
+    if len(df) >= 50:
+        # Use database data
+        actions = df.pop('action').to_numpy(dtype=np.int8)
+        quantities = df.pop('quantity').to_numpy(dtype=np.float64)
+        return df, actions, quantities
+    
+    # Fetch from yfinance if not enough data
+    hist_data = fetch_history(symbol, start_date, end_date)
+    
+    if hist_data.empty:
+        raise HTTPException(status_code=404, detail=f"No data available for {symbol}")
+    
+    df = pd.DataFrame({
+        'open': hist_data['Open'],
+        'high': hist_data['High'],
+        'low': hist_data['Low'],
+        'close': hist_data['Close'],
+        'volume': hist_data['Volume']
+    })
+    store_history(db, symbol, df)
+    return df, None, None
 
 
 @app.get("/")
@@ -229,59 +499,36 @@ async def run_backtest(
     start_date: datetime,
     end_date: datetime,
     initial_capital: float = 100000.0,
-    strategy: str = "momentum"
+    strategy: str = "momentum",
+    db: Session = Depends(get_session)
 ):
     """Run backtest for a symbol and date range."""
     try:
-        # Get historical data
-        db = get_db_session()
-        try:
-            data_points = db.query(MarketDataPoint).filter(
-                MarketDataPoint.symbol == symbol.upper(),
-                MarketDataPoint.timestamp >= start_date,
-                MarketDataPoint.timestamp <= end_date
-            ).order_by(MarketDataPoint.timestamp).all()
-            
-            if len(data_points) < 50:
-                # Fetch from yfinance if not enough data
-                logger.info(f"Fetching data from yfinance for {symbol}")
-                ticker = yf.Ticker(symbol)
-                hist_data = ticker.history(start=start_date, end=end_date)
-                
-                if hist_data.empty:
-                    raise HTTPException(status_code=404, detail=f"No data available for {symbol}")
-                
-                df = pd.DataFrame({
-                    'open': hist_data['Open'],
-                    'high': hist_data['High'],
-                    'low': hist_data['Low'],
-                    'close': hist_data['Close'],
-                    'volume': hist_data['Volume']
-                })
-            else:
-                # Use database data
-                df = pd.DataFrame([{
-                    'open': dp.open,
-                    'high': dp.high,
-                    'low': dp.low,
-                    'close': dp.close,
-                    'volume': dp.volume
-                } for dp in data_points])
-                df.index = pd.to_datetime([dp.timestamp for dp in data_points])
-        finally:
-            db.close()
-        
-        if len(df) < 50:
-            raise HTTPException(status_code=400, detail="Not enough data for backtesting")
-        
         # Select strategy
         if strategy == "momentum":
             strategy_func = simple_momentum_strategy
+            signals_query = MOMENTUM_SIGNALS_SQL
         else:
             raise HTTPException(status_code=400, detail=f"Unknown strategy: {strategy}")
         
-        # Run backtest
-        results = backtest_strategy(df, initial_capital, strategy_func)
+        # The database query, yfinance fetch and COPY all block, so run them in a thread
+        df, actions, quantities = await asyncio.to_thread(
+            load_backtest_data, db, symbol.upper(), start_date, end_date, signals_query
+        )
+        
+        if len(df) < 50:
+            raise HTTPException(status_code=400, detail="Not enough data for backtesting")
+        
+        # Run backtest in the process pool so the event loop stays responsive
+        loop = asyncio.get_running_loop()
+        if actions is None:
+            results = await loop.run_in_executor(
+                backtest_executor, backtest_strategy, df, initial_capital, strategy_func
+            )
+        else:
+            results = await loop.run_in_executor(
+                backtest_executor, backtest_signals, df, initial_capital, actions, quantities
+            )
         
         return BacktestResult(
             strategy_name=strategy,
@@ -298,7 +545,7 @@ async def run_backtest(
             losing_trades=results['losing_trades'],
             average_win=results['average_win'],
             average_loss=results['average_loss']
-        )
+        ).to_response()
         
     except HTTPException:
         raise
@@ -308,31 +555,28 @@ async def run_backtest(
 
 
 @app.get("/backtest/portfolio-stats")
-async def get_portfolio_stats(
+def get_portfolio_stats(
     start_date: datetime,
-    end_date: datetime
+    end_date: datetime,
+    db: Session = Depends(get_session)
 ):
     """Get portfolio statistics using stored procedure."""
-    db = get_db_session()
-    try:
-        result = db.execute(
-            text("SELECT * FROM get_portfolio_stats(:start_date, :end_date)"),
-            {"start_date": start_date, "end_date": end_date}
-        ).fetchone()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="No data available for date range")
-        
-        return {
-            "total_return": float(result[0]) if result[0] else 0.0,
-            "sharpe_ratio": float(result[1]) if result[1] else 0.0,
-            "max_drawdown": float(result[2]) if result[2] else 0.0,
-            "volatility": float(result[3]) if result[3] else 0.0,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
-        }
-    finally:
-        db.close()
+    result = db.execute(
+        text("SELECT * FROM get_portfolio_stats(:start_date, :end_date)"),
+        {"start_date": start_date, "end_date": end_date}
+    ).fetchone()
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="No data available for date range")
+    
+    return {
+        "total_return": float(result[0]) if result[0] else 0.0,
+        "sharpe_ratio": float(result[1]) if result[1] else 0.0,
+        "max_drawdown": float(result[2]) if result[2] else 0.0,
+        "volatility": float(result[3]) if result[3] else 0.0,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat()
+    }
 
 
 @app.get("/backtest/strategies")
@@ -354,7 +598,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=settings.backtesting_service_port,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
 
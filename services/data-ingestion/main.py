@@ -2,29 +2,41 @@
 import asyncio
 import sys
 import os
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from contextlib import asynccontextmanager
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import uvicorn
 from shared.config import settings
 from shared.logger import setup_logger
 from shared.kafka_client import KafkaProducerClient
 from shared.database import get_db_session
+from shared.price_cache import set_last_prices
+from shared.models import MarketData, MarketDataList
 from database.models import MarketDataPoint
-from datetime import datetime
+from datetime import datetime, timezone
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 import yfinance as yf
-import schedule
-import threading
-import time
 
 logger = setup_logger(__name__)
 
 # Global producer
 kafka_producer = None
 
+# Symbols collected every minute
+SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
+
+# Keep-alive HTTP session reused by every yfinance poll
+yf_session = requests.Session()
+yf_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,12 +45,21 @@ async def lifespan(app: FastAPI):
     kafka_producer = KafkaProducerClient()
     logger.info("Data ingestion service started")
     
-    # Start background data collection
-    background_thread = threading.Thread(target=run_scheduled_tasks, daemon=True)
-    background_thread.start()
+    # Collect all symbols every minute on the event loop, starting immediately
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        process_and_store_market_data,
+        'interval',
+        minutes=1,
+        args=[SYMBOLS],
+        next_run_time=datetime.now(),
+        jitter=5
+    )
+    scheduler.start()
     
     yield
     
+    scheduler.shutdown(wait=False)
     if kafka_producer:
         kafka_producer.close()
     logger.info("Data ingestion service stopped")
@@ -48,7 +69,8 @@ app = FastAPI(
     title="Data Ingestion Service",
     description="Real-time market data ingestion service",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -64,50 +86,68 @@ app.add_middleware(
 Instrumentator().instrument(app).expose(app)
 
 
-def fetch_market_data(symbol: str = "AAPL"):
-    """Fetch market data for a symbol."""
+def fetch_market_data_bulk(symbols: list[str]) -> list[dict]:
+    """Fetch the latest market data point for every symbol in one download."""
     try:
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d", interval="1m")
+        data = yf.download(
+            tickers=" ".join(symbols),
+            period="1d",
+            interval="1m",
+            group_by='ticker',
+            threads=True,
+            progress=False,
+            session=yf_session
+        )
+    except Exception as e:
+        logger.error(f"Error fetching data for {symbols}: {e}")
+        return []
+    
+    if data.empty:
+        logger.warning(f"No data available for {symbols}")
+        return []
+    
+    # Single-ticker downloads may come back without the ticker column level
+    if not isinstance(data.columns, pd.MultiIndex):
+        data = pd.concat({symbols[0]: data}, axis=1)
+    
+    batch = []
+    timestamp_ns = time.time_ns()
+    for symbol in symbols:
+        if symbol not in data.columns.get_level_values(0):
+            logger.warning(f"No data available for {symbol}")
+            continue
         
-        if data.empty:
+        # Symbols are aligned on a shared index, so drop bars this one lacks
+        bars = data[symbol].dropna(subset=["Close"])
+        if bars.empty:
             logger.warning(f"No data available for {symbol}")
-            return None
+            continue
         
         # Get latest data point
-        latest = data.iloc[-1]
+        latest = bars.iloc[-1]
         
-        market_data = {
+        batch.append({
             "symbol": symbol,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": timestamp_ns,
             "open": float(latest["Open"]),
             "high": float(latest["High"]),
             "low": float(latest["Low"]),
             "close": float(latest["Close"]),
             "volume": int(latest["Volume"]),
             "vwap": float((latest["High"] + latest["Low"] + latest["Close"]) / 3)
-        }
-        
-        return market_data
-    except Exception as e:
-        logger.error(f"Error fetching data for {symbol}: {e}")
-        return None
+        })
+    
+    return batch
 
 
-def process_and_store_market_data(symbol: str = "AAPL"):
-    """Process market data and store in database and Kafka."""
-    market_data = fetch_market_data(symbol)
-    
-    if not market_data:
-        return
-    
+def store_market_data(batch: list[dict]):
+    """Store a batch of market data points in the database."""
+    db = get_db_session()
     try:
-        # Store in database
-        db = get_db_session()
-        try:
-            data_point = MarketDataPoint(
+        db.bulk_save_objects([
+            MarketDataPoint(
                 symbol=market_data["symbol"],
-                timestamp=datetime.fromisoformat(market_data["timestamp"]),
+                timestamp=datetime.fromtimestamp(market_data["timestamp"] / 1e9, tz=timezone.utc),
                 open=market_data["open"],
                 high=market_data["high"],
                 low=market_data["low"],
@@ -115,45 +155,50 @@ def process_and_store_market_data(symbol: str = "AAPL"):
                 volume=market_data["volume"],
                 vwap=market_data.get("vwap")
             )
-            db.add(data_point)
-            db.commit()
-            logger.debug(f"Stored market data for {symbol}")
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error storing in database: {e}")
-        finally:
-            db.close()
+            for market_data in batch
+        ])
+        db.commit()
+        logger.debug("Stored market data for %d symbols", len(batch))
+        
+        # Refresh the shared latest-price cache once the rows are committed
+        set_last_prices({market_data["symbol"]: market_data["close"] for market_data in batch})
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error storing in database: {e}")
+    finally:
+        db.close()
+
+
+async def process_and_store_market_data(symbols: list[str]):
+    """Process market data and store in database and Kafka, one batch per call.
+    
+    Blocking yfinance, database and Kafka calls run in worker threads so the
+    event loop keeps serving requests.
+    """
+    batch = await asyncio.to_thread(fetch_market_data_bulk, symbols)
+    
+    if not batch:
+        return
+    
+    try:
+        # Store in database
+        await asyncio.to_thread(store_market_data, batch)
         
         # Publish to Kafka
         if kafka_producer:
-            kafka_producer.send(
+            # One columnar Arrow message per fetch instead of a JSON message per symbol
+            payload = MarketData.pack_batch(MarketDataList.validate_python(batch))
+            await asyncio.to_thread(
+                kafka_producer.send_batch,
                 settings.kafka_topic_market_data,
-                market_data,
-                key=symbol
+                [(payload, None)]
             )
-            logger.debug(f"Published market data for {symbol} to Kafka")
+            logger.debug("Published market data for %d symbols to Kafka", len(batch))
             
     except Exception as e:
         logger.error(f"Error processing market data: {e}")
 
 
-def run_scheduled_tasks():
-    """Run scheduled data collection tasks."""
-    # Schedule data collection every minute for multiple symbols
-    symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
-    
-    for symbol in symbols:
-        schedule.every(1).minutes.do(process_and_store_market_data, symbol=symbol)
-    
-    # Run immediately
-    for symbol in symbols:
-        process_and_store_market_data(symbol)
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
-
-
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -173,7 +218,7 @@ async def health():
 @app.post("/ingest/{symbol}")
 async def ingest_symbol(symbol: str, background_tasks: BackgroundTasks):
     """Manually trigger data ingestion for a symbol."""
-    background_tasks.add_task(process_and_store_market_data, symbol=symbol.upper())
+    background_tasks.add_task(process_and_store_market_data, symbols=[symbol.upper()])
     return {"message": f"Ingestion triggered for {symbol}", "status": "queued"}
 
 
@@ -181,7 +226,7 @@ async def ingest_symbol(symbol: str, background_tasks: BackgroundTasks):
 async def get_symbols():
     """Get list of symbols being tracked."""
     return {
-        "symbols": ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"],
+        "symbols": SYMBOLS,
         "update_frequency": "1 minute"
     }
 
@@ -191,7 +236,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=settings.data_ingestion_port,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
 
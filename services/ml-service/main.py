@@ -6,21 +6,22 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from contextlib import asynccontextmanager
 import uvicorn
+import numpy as np
 import pandas as pd
+from sqlalchemy import insert, select
 from datetime import datetime, timedelta
 from typing import Optional
 from shared.config import settings
 from shared.logger import setup_logger
 from shared.kafka_client import KafkaProducerClient, KafkaConsumerClient
-from shared.database import get_db_session
-from shared.models import TradingSignal, AnomalyAlert, MarketData
+from shared.database import AsyncSessionLocal
+from shared.models import TradingSignal, AnomalyAlert, MarketData, nan_to_none, utc_now
 from database.models import MarketDataPoint, TradingSignal as DBTradingSignal, Anomaly as DBAnomaly
 from models import PricePredictor, AnomalyDetector
-import threading
-import time
 
 logger = setup_logger(__name__)
 
@@ -30,11 +31,69 @@ anomaly_detector = None
 kafka_producer = None
 kafka_consumer = None
 
+# Signal and anomaly rows waiting to be written in bulk by the background writer
+WRITE_QUEUE_SIZE = 10000
+WRITE_BATCH_SIZE = 500
+WRITE_FLUSH_INTERVAL = 0.1  # seconds
+write_queue = None
+event_loop = None
+training_lock = asyncio.Lock()
+
+# Recent market data per symbol, kept in memory so stream processing skips the database
+HISTORY_LENGTH = settings.lstm_sequence_length + 20
+HISTORY_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class SymbolHistory:
+    """Last `length` market data points of one symbol as contiguous NumPy columns.
+    
+    Columns have room for twice the window; once full, the newest points are
+    moved back to the front, so appends are amortized O(1) and every window
+    is a plain slice.
+    """
+    
+    def __init__(self, length: int):
+        self.length = length
+        self.size = 0
+        self.timestamps = np.empty(2 * length, dtype=np.int64)  # epoch nanoseconds
+        self.columns = {name: np.empty(2 * length, dtype=np.float64) for name in HISTORY_COLUMNS}
+    
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[self.size - 1]) if self.size else None
+    
+    def append(self, timestamp: int, **values: float):
+        """Append one point; values are keyed by column name."""
+        if self.size == len(self.timestamps):
+            keep = self.length - 1
+            self.timestamps[:keep] = self.timestamps[self.size - keep:self.size]
+            for column in self.columns.values():
+                column[:keep] = column[self.size - keep:self.size]
+            self.size = keep
+        
+        self.timestamps[self.size] = timestamp
+        for name, column in self.columns.items():
+            column[self.size] = values[name]
+        self.size += 1
+    
+    def window(self, since: int) -> dict[str, np.ndarray]:
+        """Copy of the retained points at or after `since` (epoch nanoseconds)."""
+        start = max(self.size - self.length, 0)
+        start += int(np.searchsorted(self.timestamps[start:self.size], since))
+        return {name: column[start:self.size].copy() for name, column in self.columns.items()}
+
+
+market_history: dict[str, SymbolHistory] = {}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
-    global price_predictor, anomaly_detector, kafka_producer, kafka_consumer
+    global price_predictor, anomaly_detector, kafka_producer, kafka_consumer, write_queue, event_loop
+    
+    # Shared model schemas are deferred; build the ones this service publishes up front
+    TradingSignal.model_rebuild()
+    AnomalyAlert.model_rebuild()
     
     # Initialize models
     price_predictor = PricePredictor(sequence_length=settings.lstm_sequence_length)
@@ -44,21 +103,36 @@ async def lifespan(app: FastAPI):
     kafka_producer = KafkaProducerClient()
     kafka_consumer = KafkaConsumerClient(
         topics=[settings.kafka_topic_market_data],
-        group_id="ml-service"
+        group_id="ml-service",
+        value_deserializer=None
     )
+    await kafka_consumer.start()
+    
+    # Start the background database writer
+    event_loop = asyncio.get_running_loop()
+    write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+    writer_task = asyncio.create_task(write_pending_rows())
     
     # Train models if needed
     asyncio.create_task(train_models_if_needed())
     
     # Start background processing
-    background_thread = threading.Thread(target=process_market_data_stream, daemon=True)
-    background_thread.start()
+    consumer_task = asyncio.create_task(consume_market_data())
     
     logger.info("ML service started")
     yield
     
+    consumer_task.cancel()
+    
+    # Flush whatever the writer had not picked up yet
+    writer_task.cancel()
+    remaining = []
+    while not write_queue.empty():
+        remaining.append(write_queue.get_nowait())
+    await store_rows(remaining)
+    
     if kafka_consumer:
-        kafka_consumer.close()
+        await kafka_consumer.close()
     if kafka_producer:
         kafka_producer.close()
     logger.info("ML service stopped")
@@ -68,7 +142,8 @@ app = FastAPI(
     title="ML Service",
     description="Machine learning service for price prediction and anomaly detection",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -84,91 +159,216 @@ app.add_middleware(
 Instrumentator().instrument(app).expose(app)
 
 
+def train_models(df: pd.DataFrame) -> tuple[PricePredictor, AnomalyDetector]:
+    """Fit fresh model instances; the ones serving predictions are left untouched."""
+    predictor = PricePredictor(sequence_length=settings.lstm_sequence_length)
+    predictor.train(df, epochs=20)
+    detector = AnomalyDetector(contamination=settings.anomaly_detection_threshold)
+    detector.train(df)
+    return predictor, detector
+
+
 async def train_models_if_needed():
     """Train models with historical data if they don't exist."""
+    global price_predictor, anomaly_detector
+    
     try:
-        db = get_db_session()
-        try:
-            # Get historical data
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            data_points = db.query(MarketDataPoint).filter(
-                MarketDataPoint.timestamp >= cutoff_date,
-                MarketDataPoint.symbol == "AAPL"
-            ).order_by(MarketDataPoint.timestamp).all()
+        # Get historical data
+        cutoff_date = utc_now() - timedelta(days=30)
+        df = await load_market_data("AAPL", cutoff_date)
+        
+        if len(df) >= 100:  # Need minimum data
+            # Training is CPU-bound, so it runs off the event loop that consumes
+            # Kafka and writes rows; one run at a time, as runs share model files
+            async with training_lock:
+                predictor, detector = await asyncio.to_thread(train_models, df)
             
-            if len(data_points) >= 100:  # Need minimum data
-                df = pd.DataFrame([{
-                    'timestamp': dp.timestamp,
-                    'open': dp.open,
-                    'high': dp.high,
-                    'low': dp.low,
-                    'close': dp.close,
-                    'volume': dp.volume
-                } for dp in data_points])
-                
-                # Train models
-                if price_predictor:
-                    price_predictor.train(df, epochs=20)
-                if anomaly_detector:
-                    anomaly_detector.train(df)
-                
-                logger.info("Models trained with historical data")
-        finally:
-            db.close()
+            # Swap in whole models, so score_batch never sees one mid-training
+            price_predictor, anomaly_detector = predictor, detector
+            
+            logger.info("Models trained with historical data")
     except Exception as e:
         logger.error(f"Error training models: {e}")
 
 
-def process_market_data_stream():
-    """Process incoming market data stream."""
-    def process_message(message: dict, key: Optional[str]):
+def queue_write(model, row: dict):
+    """Queue a row for the background writer; safe to call from worker threads."""
+    def put():
         try:
-            market_data = MarketData(**message)
-            
-            # Get historical data for prediction
-            db = get_db_session()
+            write_queue.put_nowait((model, row))
+        except asyncio.QueueFull:
+            logger.error(f"Write queue full, dropping {model.__tablename__} row for {row['symbol']}")
+    
+    event_loop.call_soon_threadsafe(put)
+
+
+async def store_rows(batch: list[tuple[type, dict]]):
+    """Insert queued rows with one executemany per table and a single commit."""
+    if not batch:
+        return
+    
+    rows_by_model: dict[type, list[dict]] = {}
+    for model, row in batch:
+        rows_by_model.setdefault(model, []).append(row)
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            for model, rows in rows_by_model.items():
+                await db.execute(insert(model), rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error storing {len(batch)} queued rows: {e}")
+
+
+async def write_pending_rows():
+    """Drain the write queue every WRITE_FLUSH_INTERVAL or WRITE_BATCH_SIZE rows."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await write_queue.get()]
+        deadline = loop.time() + WRITE_FLUSH_INTERVAL
+        while len(batch) < WRITE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
             try:
-                cutoff_time = datetime.fromisoformat(market_data.timestamp) - timedelta(hours=1)
-                historical_data = db.query(MarketDataPoint).filter(
-                    MarketDataPoint.symbol == market_data.symbol,
-                    MarketDataPoint.timestamp >= cutoff_time
-                ).order_by(MarketDataPoint.timestamp).all()
-                
-                if len(historical_data) >= price_predictor.sequence_length:
-                    # Prepare DataFrame
-                    df = pd.DataFrame([{
-                        'timestamp': dp.timestamp,
-                        'open': dp.open,
-                        'high': dp.high,
-                        'low': dp.low,
-                        'close': dp.close,
-                        'volume': dp.volume
-                    } for dp in historical_data])
-                    
-                    # Generate trading signal
-                    generate_trading_signal(market_data, df)
-                    
-                    # Detect anomalies
-                    detect_anomalies(market_data, df)
-            finally:
-                db.close()
-                
+                batch.append(await asyncio.wait_for(write_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        await store_rows(batch)
+
+
+def market_data_query(symbol: str):
+    """Select OHLCV columns for a symbol without materializing ORM objects."""
+    return select(
+        MarketDataPoint.timestamp,
+        MarketDataPoint.open,
+        MarketDataPoint.high,
+        MarketDataPoint.low,
+        MarketDataPoint.close,
+        MarketDataPoint.volume
+    ).where(MarketDataPoint.symbol == symbol)
+
+
+async def load_market_data(symbol: str, since: datetime) -> pd.DataFrame:
+    """Load market data for a symbol since a point in time, oldest first."""
+    stmt = market_data_query(symbol).where(
+        MarketDataPoint.timestamp >= since
+    ).order_by(MarketDataPoint.timestamp)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+async def load_recent_history(symbol: str) -> SymbolHistory:
+    """Load the most recent market data points for a symbol from the database."""
+    stmt = market_data_query(symbol).order_by(
+        MarketDataPoint.timestamp.desc()
+    ).limit(HISTORY_LENGTH)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(stmt)).all()
+    
+    history = SymbolHistory(HISTORY_LENGTH)
+    for row in reversed(rows):
+        history.append(
+            pd.Timestamp(row.timestamp).value,
+            open=row.open,
+            high=row.high,
+            low=row.low,
+            close=row.close,
+            volume=row.volume
+        )
+    return history
+
+
+async def update_history(market_data: MarketData) -> Optional[tuple[MarketData, dict[str, np.ndarray]]]:
+    """Append a tick to its symbol's history and return the prediction window once it is long enough."""
+    timestamp_ns = market_data.timestamp_us * 1000
+    
+    # Warm the symbol's window from the database once, then keep it in memory
+    history = market_history.get(market_data.symbol)
+    if history is None:
+        history = await load_recent_history(market_data.symbol)
+        market_history[market_data.symbol] = history
+    
+    if history.last_timestamp is None or history.last_timestamp < timestamp_ns:
+        history.append(
+            timestamp_ns,
+            open=market_data.open,
+            high=market_data.high,
+            low=market_data.low,
+            close=market_data.close,
+            volume=market_data.volume
+        )
+    
+    # Only use the last hour of data for prediction
+    cutoff_ns = timestamp_ns - pd.Timedelta(hours=1).value
+    window = history.window(cutoff_ns)
+    
+    if len(window['close']) < price_predictor.sequence_length:
+        return None
+    return market_data, window
+
+
+def score_batch(ready: list[tuple[MarketData, dict[str, np.ndarray]]]):
+    """Run price prediction and anomaly detection for a batch of ticks."""
+    # Predict next price for the whole batch in one forward pass
+    try:
+        predicted_prices = price_predictor.predict_batch(
+            [window['close'] for _, window in ready]
+        )
+    except Exception as e:
+        logger.error(f"Error predicting prices: {e}")
+        predicted_prices = [None] * len(ready)
+    
+    for (market_data, window), predicted_price in zip(ready, predicted_prices):
+        # Generate trading signal
+        if predicted_price is not None:
+            generate_trading_signal(market_data, float(predicted_price))
+        
+        # Detect anomalies
+        detect_anomalies(market_data, window)
+
+
+async def process_batch(messages: list[tuple[bytes, Optional[str]]]):
+    """Process a batch of market data messages, each an Arrow batch of ticks."""
+    ready = []
+    for payload, key in messages:
+        try:
+            batch = MarketData.unpack_batch(payload)
         except Exception as e:
-            logger.error(f"Error processing market data: {e}")
+            logger.error(f"Error decoding market data batch: {e}")
+            continue
+        
+        for market_data in batch:
+            try:
+                item = await update_history(market_data)
+                if item is not None:
+                    ready.append(item)
+            except Exception as e:
+                logger.error(f"Error processing market data: {e}")
     
+    if ready:
+        # Model inference and Kafka publishing block, so keep them off the event loop
+        await asyncio.to_thread(score_batch, ready)
+
+
+async def consume_market_data():
+    """Consume the market data topic on the event loop, up to 256 records per poll."""
     while True:
         try:
-            kafka_consumer.consume(process_message)
+            messages = await kafka_consumer.get_batch(max_records=256)
+            if messages:
+                await process_batch(messages)
         except Exception as e:
             logger.error(f"Error in consumer loop: {e}")
-            time.sleep(5)
+            await asyncio.sleep(5)
 
 
-def generate_trading_signal(market_data: MarketData, historical_df: pd.DataFrame):
+def generate_trading_signal(market_data: MarketData, predicted_price: float):
     """Generate trading signal based on prediction."""
     try:
-        # Predict next price
-        predicted_price = price_predictor.predict(historical_df)
         current_price = market_data.close
         
         # Calculate confidence based on prediction vs current
@@ -196,7 +396,7 @@ def generate_trading_signal(market_data: MarketData, historical_df: pd.DataFrame
         
         signal = TradingSignal(
             symbol=market_data.symbol,
-            timestamp=datetime.fromisoformat(market_data.timestamp),
+            timestamp=market_data.timestamp,
             action=action,
             confidence=confidence,
             predicted_price=predicted_price,
@@ -207,32 +407,23 @@ def generate_trading_signal(market_data: MarketData, historical_df: pd.DataFrame
         )
         
         # Store in database
-        db = get_db_session()
-        try:
-            db_signal = DBTradingSignal(
-                symbol=signal.symbol,
-                timestamp=signal.timestamp,
-                action=signal.action,
-                confidence=signal.confidence,
-                predicted_price=signal.predicted_price,
-                current_price=signal.current_price,
-                stop_loss=signal.stop_loss,
-                take_profit=signal.take_profit,
-                model_version=signal.model_version
-            )
-            db.add(db_signal)
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error storing signal: {e}")
-        finally:
-            db.close()
+        queue_write(DBTradingSignal, {
+            'symbol': signal.symbol,
+            'timestamp': signal.timestamp,
+            'action': signal.action.value,
+            'confidence': signal.confidence,
+            'predicted_price': nan_to_none(signal.predicted_price),
+            'current_price': signal.current_price,
+            'stop_loss': nan_to_none(signal.stop_loss),
+            'take_profit': nan_to_none(signal.take_profit),
+            'model_version': signal.model_version
+        })
         
         # Publish to Kafka
         if kafka_producer and action != "HOLD":
             kafka_producer.send(
                 settings.kafka_topic_trading_signals,
-                signal.dict(),
+                signal.to_json_bytes(),
                 key=signal.symbol
             )
             logger.info(f"Generated {action} signal for {signal.symbol} with confidence {confidence:.2f}")
@@ -241,15 +432,24 @@ def generate_trading_signal(market_data: MarketData, historical_df: pd.DataFrame
         logger.error(f"Error generating trading signal: {e}")
 
 
-def detect_anomalies(market_data: MarketData, historical_df: pd.DataFrame):
+def recent_mean_change(values: np.ndarray, periods: int = 5) -> float:
+    """Mean of the last `periods` percentage changes, skipping undefined ones."""
+    recent = values[-(periods + 1):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = recent[1:] / recent[:-1] - 1
+    changes = changes[~np.isnan(changes)]
+    return float(changes.mean()) if len(changes) else float('nan')
+
+
+def detect_anomalies(market_data: MarketData, window: dict[str, np.ndarray]):
     """Detect anomalies in market data."""
     try:
-        is_anomaly, anomaly_score = anomaly_detector.detect(historical_df)
+        is_anomaly, anomaly_score = anomaly_detector.detect(window)
         
         if is_anomaly:
             # Determine anomaly type
-            recent_returns = historical_df['close'].pct_change().tail(5).mean()
-            volume_change = historical_df['volume'].pct_change().tail(5).mean()
+            recent_returns = recent_mean_change(window['close'])
+            volume_change = recent_mean_change(window['volume'])
             
             if abs(recent_returns) > 0.05:
                 anomaly_type = "PRICE_SPIKE"
@@ -263,7 +463,7 @@ def detect_anomalies(market_data: MarketData, historical_df: pd.DataFrame):
             
             alert = AnomalyAlert(
                 symbol=market_data.symbol,
-                timestamp=datetime.fromisoformat(market_data.timestamp),
+                timestamp=market_data.timestamp,
                 anomaly_score=anomaly_score,
                 anomaly_type=anomaly_type,
                 description=f"Detected {anomaly_type} for {market_data.symbol}",
@@ -272,29 +472,20 @@ def detect_anomalies(market_data: MarketData, historical_df: pd.DataFrame):
             )
             
             # Store in database
-            db = get_db_session()
-            try:
-                db_anomaly = DBAnomaly(
-                    symbol=alert.symbol,
-                    timestamp=alert.timestamp,
-                    anomaly_score=alert.anomaly_score,
-                    anomaly_type=alert.anomaly_type,
-                    description=alert.description,
-                    severity=alert.severity
-                )
-                db.add(db_anomaly)
-                db.commit()
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Error storing anomaly: {e}")
-            finally:
-                db.close()
+            queue_write(DBAnomaly, {
+                'symbol': alert.symbol,
+                'timestamp': alert.timestamp,
+                'anomaly_score': alert.anomaly_score,
+                'anomaly_type': alert.anomaly_type,
+                'description': alert.description,
+                'severity': alert.severity.value
+            })
             
             # Publish to Kafka
             if kafka_producer:
                 kafka_producer.send(
                     settings.kafka_topic_anomalies,
-                    alert.dict(),
+                    alert.to_json_bytes(),
                     key=alert.symbol
                 )
                 logger.warning(f"Anomaly detected for {alert.symbol}: {anomaly_type} ({severity})")
@@ -323,41 +514,25 @@ async def health():
 async def predict_price(symbol: str):
     """Get price prediction for a symbol."""
     try:
-        db = get_db_session()
-        try:
-            # Get recent data
-            cutoff_time = datetime.utcnow() - timedelta(hours=1)
-            data_points = db.query(MarketDataPoint).filter(
-                MarketDataPoint.symbol == symbol.upper(),
-                MarketDataPoint.timestamp >= cutoff_time
-            ).order_by(MarketDataPoint.timestamp).all()
-            
-            if len(data_points) < price_predictor.sequence_length:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Not enough data. Need at least {price_predictor.sequence_length} data points"
-                )
-            
-            df = pd.DataFrame([{
-                'timestamp': dp.timestamp,
-                'open': dp.open,
-                'high': dp.high,
-                'low': dp.low,
-                'close': dp.close,
-                'volume': dp.volume
-            } for dp in data_points])
-            
-            predicted_price = price_predictor.predict(df)
-            current_price = data_points[-1].close
-            
-            return {
-                "symbol": symbol.upper(),
-                "current_price": current_price,
-                "predicted_price": predicted_price,
-                "expected_change": ((predicted_price - current_price) / current_price) * 100
-            }
-        finally:
-            db.close()
+        # Get recent data
+        cutoff_time = utc_now() - timedelta(hours=1)
+        df = await load_market_data(symbol.upper(), cutoff_time)
+        
+        if len(df) < price_predictor.sequence_length:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not enough data. Need at least {price_predictor.sequence_length} data points"
+            )
+        
+        predicted_price = price_predictor.predict(df)
+        current_price = float(df['close'].iloc[-1])
+        
+        return {
+            "symbol": symbol.upper(),
+            "current_price": current_price,
+            "predicted_price": predicted_price,
+            "expected_change": ((predicted_price - current_price) / current_price) * 100
+        }
     except Exception as e:
         logger.error(f"Error in prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -367,36 +542,20 @@ async def predict_price(symbol: str):
 async def detect_anomaly(symbol: str):
     """Manually trigger anomaly detection for a symbol."""
     try:
-        db = get_db_session()
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(hours=1)
-            data_points = db.query(MarketDataPoint).filter(
-                MarketDataPoint.symbol == symbol.upper(),
-                MarketDataPoint.timestamp >= cutoff_time
-            ).order_by(MarketDataPoint.timestamp).all()
-            
-            if len(data_points) < 10:
-                raise HTTPException(status_code=400, detail="Not enough data for anomaly detection")
-            
-            df = pd.DataFrame([{
-                'timestamp': dp.timestamp,
-                'open': dp.open,
-                'high': dp.high,
-                'low': dp.low,
-                'close': dp.close,
-                'volume': dp.volume
-            } for dp in data_points])
-            
-            is_anomaly, score = anomaly_detector.detect(df)
-            
-            return {
-                "symbol": symbol.upper(),
-                "is_anomaly": is_anomaly,
-                "anomaly_score": score,
-                "threshold": settings.anomaly_detection_threshold
-            }
-        finally:
-            db.close()
+        cutoff_time = utc_now() - timedelta(hours=1)
+        df = await load_market_data(symbol.upper(), cutoff_time)
+        
+        if len(df) < 10:
+            raise HTTPException(status_code=400, detail="Not enough data for anomaly detection")
+        
+        is_anomaly, score = anomaly_detector.detect(df)
+        
+        return {
+            "symbol": symbol.upper(),
+            "is_anomaly": is_anomaly,
+            "anomaly_score": score,
+            "threshold": settings.anomaly_detection_threshold
+        }
     except Exception as e:
         logger.error(f"Error in anomaly detection: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -414,7 +573,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=settings.ml_service_port,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
 
@@ -1,15 +1,17 @@
 """ML models for price prediction and anomaly detection."""
 import numpy as np
 import pandas as pd
+import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras.layers import Input, LSTM, Dense, Dropout
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import joblib
 import os
-from typing import Tuple, Optional
+import threading
+from typing import Tuple, Optional, Union
 from shared.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -21,9 +23,16 @@ class PricePredictor:
     def __init__(self, sequence_length: int = 30, model_path: Optional[str] = None):
         self.sequence_length = sequence_length
         self.model = None
+        self._predict_fn = None
+        self.interpreter = None
+        # The TFLite interpreter is not thread-safe; stream scoring and /predict share it
+        self._interpreter_lock = threading.Lock()
         self.scaler = MinMaxScaler()
+        self._scale = None
+        self._offset = None
         self.model_path = model_path or "models/lstm_price_predictor.h5"
         self.scaler_path = "models/price_scaler.pkl"
+        self.tflite_path = "models/lstm_price_predictor.tflite"
         
         # Create models directory if it doesn't exist
         os.makedirs("models", exist_ok=True)
@@ -34,15 +43,24 @@ class PricePredictor:
             self.build_model()
     
     def build_model(self):
-        """Build LSTM model architecture."""
+        """Build LSTM model architecture.
+        
+        The LSTM layers keep Keras' default tanh/sigmoid activations, no recurrent
+        dropout and no unrolling so they run on the fused cuDNN kernel on GPU.
+        """
+        if tf.config.list_physical_devices('GPU'):
+            keras.mixed_precision.set_global_policy('mixed_float16')
+        
         self.model = Sequential([
-            LSTM(50, return_sequences=True, input_shape=(self.sequence_length, 1)),
+            Input(shape=(self.sequence_length, 1)),
+            LSTM(50, return_sequences=True),
             Dropout(0.2),
             LSTM(50, return_sequences=True),
             Dropout(0.2),
             LSTM(50),
             Dropout(0.2),
-            Dense(1)
+            # Keep the regression output in float32 under mixed precision
+            Dense(1, dtype='float32')
         ])
         
         self.model.compile(
@@ -50,32 +68,45 @@ class PricePredictor:
             loss='mean_squared_error',
             metrics=['mae']
         )
+        self.compile_predict()
         logger.info("LSTM model built")
     
+    def compile_predict(self):
+        """Trace the forward pass once for a fixed input signature and warm it up."""
+        model = self.model
+        self._predict_fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec([None, self.sequence_length, 1], tf.float32)]
+        )
+        self._predict_fn(np.zeros((1, self.sequence_length, 1), dtype=np.float32))
+    
+    def cache_scaler_params(self):
+        """Keep the fitted MinMaxScaler's scale and offset as plain floats."""
+        self._scale = float(self.scaler.scale_[0])
+        self._offset = float(self.scaler.min_[0])
+    
     def prepare_data(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
         """Prepare data for training."""
         # Use closing prices
         prices = data['close'].values.reshape(-1, 1)
         
         # Scale data
-        scaled_prices = self.scaler.fit_transform(prices)
+        scaled_prices = self.scaler.fit_transform(prices).ravel()
+        self.cache_scaler_params()
         
-        # Create sequences
-        X, y = [], []
-        for i in range(self.sequence_length, len(scaled_prices)):
-            X.append(scaled_prices[i-self.sequence_length:i, 0])
-            y.append(scaled_prices[i, 0])
+        # Create sequences: every window of sequence_length predicts the next price
+        windows = np.lib.stride_tricks.sliding_window_view(scaled_prices, self.sequence_length)
+        X = windows[:-1].astype(np.float32)
+        y = scaled_prices[self.sequence_length:].astype(np.float32)
         
-        return np.array(X), np.array(y)
+        # Shape (samples, timesteps, features) for the LSTM
+        return X[..., None], y
     
     def train(self, data: pd.DataFrame, epochs: int = 50, batch_size: int = 32):
         """Train the model."""
         logger.info("Training LSTM model...")
         X, y = self.prepare_data(data)
         
-        # Reshape for LSTM
-        X = X.reshape((X.shape[0], X.shape[1], 1))
-        
         # Split data
         split = int(0.8 * len(X))
         X_train, X_test = X[:split], X[split:]
@@ -92,6 +123,7 @@ class PricePredictor:
         
         # Save model
         self.save_model()
+        self.quantize(X_train)
         logger.info("Model training completed")
         
         return history
@@ -101,20 +133,81 @@ class PricePredictor:
         if len(data) < self.sequence_length:
             raise ValueError(f"Need at least {self.sequence_length} data points")
         
-        # Get last sequence_length points
-        recent_data = data['close'].tail(self.sequence_length).values.reshape(-1, 1)
-        scaled_data = self.scaler.transform(recent_data)
+        return float(self.predict_batch([data['close'].to_numpy()])[0])
+    
+    def predict_batch(self, closes: list[np.ndarray]) -> np.ndarray:
+        """Predict the next price for several close series in one forward pass."""
+        # Last sequence_length points of every series, shape (batch, sequence_length)
+        if self._scale is None:
+            raise ValueError("Price scaler has not been fitted")
+        recent_data = np.stack([series[-self.sequence_length:] for series in closes])
         
-        # Reshape for prediction
-        X = scaled_data.reshape(1, self.sequence_length, 1)
+        # Same affine map as scaler.transform, without sklearn's per-call validation
+        X = (recent_data * self._scale + self._offset).astype(np.float32)[..., None]
         
-        # Predict
-        prediction = self.model.predict(X, verbose=0)
+        # Predict, preferring the quantized model
+        prediction = self.run_interpreter(X)
+        if prediction is None:
+            prediction = self._predict_fn(X).numpy()
         
         # Inverse transform
-        predicted_price = self.scaler.inverse_transform(prediction)[0][0]
+        return (prediction.ravel() - self._offset) / self._scale
+    
+    def quantize(self, X_sample: np.ndarray):
+        """Convert the trained model to an int8 TFLite model for inference."""
+        def representative_dataset():
+            for sample in X_sample[:100]:
+                yield [sample[None, ...]]
+        
+        try:
+            converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = representative_dataset
+            # Fall back to float kernels for ops without an int8 implementation
+            converter.target_spec.supported_ops = [
+                tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                tf.lite.OpsSet.TFLITE_BUILTINS
+            ]
+            tflite_model = converter.convert()
+        except Exception as e:
+            logger.warning(f"Could not quantize LSTM model, using float inference: {e}")
+            # Do not keep serving, or reload on restart, the previous model's weights
+            with self._interpreter_lock:
+                self.interpreter = None
+            if os.path.exists(self.tflite_path):
+                os.remove(self.tflite_path)
+            return
         
-        return float(predicted_price)
+        with open(self.tflite_path, 'wb') as f:
+            f.write(tflite_model)
+        self.load_interpreter(tflite_model)
+        logger.info("Quantized model saved")
+    
+    def load_interpreter(self, tflite_model: bytes):
+        """Create the TFLite interpreter used for inference."""
+        interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=4)
+        interpreter.allocate_tensors()
+        with self._interpreter_lock:
+            self.interpreter = interpreter
+    
+    def run_interpreter(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """Run a (batch, sequence_length, 1) float32 batch through the TFLite model.
+        
+        Returns None when no quantized model is loaded. Calls are serialized,
+        since invoking and resizing the interpreter is not thread-safe.
+        """
+        with self._interpreter_lock:
+            if self.interpreter is None:
+                return None
+            
+            input_details = self.interpreter.get_input_details()[0]
+            if input_details['shape'][0] != len(X):
+                self.interpreter.resize_tensor_input(input_details['index'], X.shape)
+                self.interpreter.allocate_tensors()
+            
+            self.interpreter.set_tensor(input_details['index'], X)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.interpreter.get_output_details()[0]['index'])
     
     def save_model(self):
         """Save model and scaler."""
@@ -126,6 +219,11 @@ class PricePredictor:
         """Load model and scaler."""
         self.model = load_model(self.model_path)
         self.scaler = joblib.load(self.scaler_path)
+        self.cache_scaler_params()
+        self.compile_predict()
+        if os.path.exists(self.tflite_path):
+            with open(self.tflite_path, 'rb') as f:
+                self.load_interpreter(f.read())
         logger.info("Model loaded")
 
 
@@ -134,7 +232,14 @@ class AnomalyDetector:
     
     def __init__(self, contamination: float = 0.1, model_path: Optional[str] = None):
         self.contamination = contamination
-        self.model = IsolationForest(contamination=contamination, random_state=42)
+        # Fit trees on every core; scoring a single sample stays sequential
+        self.model = IsolationForest(
+            contamination=contamination,
+            n_estimators=64,
+            max_samples=256,
+            n_jobs=-1,
+            random_state=42
+        )
         self.scaler = StandardScaler()
         self.model_path = model_path or "models/anomaly_detector.pkl"
         self.scaler_path = "models/anomaly_scaler.pkl"
@@ -144,44 +249,52 @@ class AnomalyDetector:
         if os.path.exists(self.model_path):
             self.load_model()
     
-    def extract_features(self, data: pd.DataFrame) -> np.ndarray:
-        """Extract features for anomaly detection."""
-        features = []
+    def extract_features(
+        self,
+        data: Union[pd.DataFrame, dict[str, np.ndarray]],
+        only_last: bool = False
+    ) -> np.ndarray:
+        """Extract features for anomaly detection.
         
-        # Price features
-        features.append(data['close'].values)
-        features.append(data['volume'].values)
+        Columns are close, volume, return, 10-bar return volatility, high-low
+        spread and volume change. data is a DataFrame or a dict of column
+        arrays. With only_last, just the final row is built, from the trailing
+        11 bars it depends on.
+        """
+        def column(name: str) -> np.ndarray:
+            values = np.asarray(data[name], dtype=np.float64)
+            return values[-11:] if only_last else values
         
-        # Technical indicators
-        if len(data) > 1:
-            returns = data['close'].pct_change().fillna(0).values
-            features.append(returns)
-            
-            # Volatility (rolling std of returns)
-            if len(data) > 10:
-                volatility = returns.rolling(window=10).std().fillna(0).values
-                features.append(volatility)
-            else:
-                features.append(np.zeros(len(data)))
-        else:
-            features.append(np.zeros(len(data)))
-            features.append(np.zeros(len(data)))
+        close = column('close')
+        volume = column('volume')
+        high = column('high')
+        low = column('low')
+        n = len(close)
         
-        # High-Low spread
-        spread = ((data['high'] - data['low']) / data['close']).values
-        features.append(spread)
+        returns = np.zeros(n)
+        volume_change = np.zeros(n)
+        volatility = np.zeros(n)
         
-        # Volume change
-        if len(data) > 1:
-            volume_change = data['volume'].pct_change().fillna(0).values
-            features.append(volume_change)
-        else:
-            features.append(np.zeros(len(data)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Technical indicators
+            if n > 1:
+                returns[1:] = np.diff(close) / close[:-1]
+                volume_change[1:] = np.diff(volume) / volume[:-1]
+                returns[np.isnan(returns)] = 0.0
+                volume_change[np.isnan(volume_change)] = 0.0
+            
+            # Volatility (rolling std of returns)
+            if n > 10:
+                windows = np.lib.stride_tricks.sliding_window_view(returns, 10)
+                volatility[9:] = windows.std(axis=1, ddof=1)
+            
+            # High-Low spread
+            spread = (high - low) / close
         
         # Stack features
-        feature_matrix = np.column_stack(features)
+        feature_matrix = np.column_stack([close, volume, returns, volatility, spread, volume_change])
         
-        return feature_matrix
+        return feature_matrix[-1:] if only_last else feature_matrix
     
     def train(self, data: pd.DataFrame):
         """Train the anomaly detector."""
@@ -198,21 +311,17 @@ class AnomalyDetector:
         self.save_model()
         logger.info("Anomaly detector trained")
     
-    def detect(self, data: pd.DataFrame) -> Tuple[bool, float]:
+    def detect(self, data: Union[pd.DataFrame, dict[str, np.ndarray]]) -> Tuple[bool, float]:
         """Detect anomalies in data."""
-        features = self.extract_features(data)
-        
         # Use last data point
-        last_features = features[-1:].reshape(1, -1)
+        last_features = self.extract_features(data, only_last=True)
         scaled_features = self.scaler.transform(last_features)
         
-        # Predict
-        prediction = self.model.predict(scaled_features)
-        score = self.model.score_samples(scaled_features)[0]
+        # Score once; predict() would walk the trees again to compare against offset_
+        anomaly_score = float(self.model.score_samples(scaled_features)[0])
         
-        # Anomaly if prediction is -1
-        is_anomaly = prediction[0] == -1
-        anomaly_score = float(score)
+        # Anomaly where predict() would return -1
+        is_anomaly = bool(anomaly_score < self.model.offset_)
         
         return is_anomaly, anomaly_score
     
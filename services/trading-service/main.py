@@ -4,26 +4,30 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from contextlib import asynccontextmanager
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import uvicorn
-from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import text
+from sqlalchemy import func, insert, select, text
 from sqlalchemy.orm import Session
 import uuid
+import redis
 from shared.config import settings
 from shared.logger import setup_logger
 from shared.kafka_client import KafkaConsumerClient, KafkaProducerClient
-from shared.database import get_db_session, get_db
-from shared.models import Order as OrderModel, Position as PositionModel, Portfolio as PortfolioModel
+from shared.database import get_db_session, get_db, AsyncSessionLocal
+from shared.price_cache import get_last_prices, redis_client
+from shared.models import (
+    Order as OrderModel, Position as PositionModel, Portfolio as PortfolioModel, TradingSignal, SignalAction, PositionList,
+    utc_now
+)
 from database.models import (
-    Order, Position, Trade, Account, MarketDataPoint
+    Order, Position, Trade, Account
 )
-import threading
-import time
 
 logger = setup_logger(__name__)
 
@@ -31,32 +35,65 @@ logger = setup_logger(__name__)
 kafka_producer = None
 kafka_consumer = None
 
+# Latest close per symbol; one array parameter keeps the SQL text constant,
+# so the driver reuses a single server-side prepared statement
+LATEST_PRICES_SQL = text("""
+    SELECT symbol, close
+    FROM latest_market_data
+    WHERE symbol = ANY(CAST(:symbols AS text[]))
+""")
+
+# Bumped after every committed fill or mark-to-market; backs the read ETags
+PORTFOLIO_VERSION_KEY = "trading:portfolio:version"
+
+# Fills lock the account before positions; mark-to-market takes the same order
+LOCK_ACCOUNT_SQL = text("SELECT 1 FROM account FOR UPDATE")
+
+# Mark every position to its latest close in one statement
+UPDATE_POSITION_PRICES_SQL = text("""
+    UPDATE positions p
+    SET current_price = latest.close,
+        unrealized_pnl = (latest.close - p.average_price) * p.quantity,
+        last_updated = now()
+    FROM latest_market_data latest
+    WHERE p.symbol = latest.symbol
+""")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
     global kafka_producer, kafka_consumer
     
+    # Shared model schemas are deferred; build the ones this service uses up front
+    for model in (TradingSignal, OrderModel, PositionModel, PortfolioModel):
+        model.model_rebuild()
+    
     # Initialize Kafka
     kafka_producer = KafkaProducerClient()
     kafka_consumer = KafkaConsumerClient(
         topics=[settings.kafka_topic_trading_signals],
-        group_id="trading-service"
+        group_id="trading-service",
+        value_deserializer=None
     )
+    await kafka_consumer.start()
     
-    # Start background order processing
-    background_thread = threading.Thread(target=process_trading_signals, daemon=True)
-    background_thread.start()
+    # Start background order processing; a single consumer keeps signals in order,
+    # and fills serialize on the account row lock anyway
+    consumer_task = asyncio.create_task(process_trading_signals())
     
-    # Start position update thread
-    update_thread = threading.Thread(target=update_positions_prices, daemon=True)
-    update_thread.start()
+    # Mark positions to market every minute on the event loop
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(update_positions_prices, 'interval', minutes=1)
+    scheduler.start()
     
     logger.info("Trading service started")
     yield
     
+    scheduler.shutdown(wait=False)
+    consumer_task.cancel()
     if kafka_consumer:
-        kafka_consumer.close()
+        await kafka_consumer.close()
     if kafka_producer:
         kafka_producer.close()
     logger.info("Trading service stopped")
@@ -66,7 +103,8 @@ app = FastAPI(
     title="Trading Service",
     description="Trading service for order execution and portfolio management",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -82,16 +120,26 @@ app.add_middleware(
 Instrumentator().instrument(app).expose(app)
 
 
-def check_risk_limits(symbol: str, side: str, quantity: float, price: float, db: Session) -> tuple[bool, str]:
+def check_risk_limits(
+    symbol: str,
+    side: str,
+    quantity: float,
+    price: float,
+    db: Session,
+    account: Optional[Account] = None
+) -> tuple[bool, str]:
     """Check risk management limits before executing order."""
+    max_position_size = settings.max_position_size
     try:
-        # Get account
-        account = db.query(Account).first()
+        # Lock the account and position rows until the fill commits;
+        # a passed-in account must already be locked by the caller
+        if account is None:
+            account = db.query(Account).with_for_update().first()
         if not account:
             return False, "Account not found"
         
         # Get current positions
-        position = db.query(Position).filter(Position.symbol == symbol).first()
+        position = db.query(Position).filter(Position.symbol == symbol).with_for_update().first()
         
         if side == "BUY":
             # Check available cash
@@ -102,13 +150,13 @@ def check_risk_limits(symbol: str, side: str, quantity: float, price: float, db:
             # Check position size limit
             portfolio_value = account.total_value
             position_value = quantity * price
-            if position_value > portfolio_value * settings.max_position_size:
-                return False, f"Position size exceeds limit. Max: {settings.max_position_size*100}% of portfolio"
+            if position_value > portfolio_value * max_position_size:
+                return False, f"Position size exceeds limit. Max: {max_position_size*100}% of portfolio"
             
             # Check if adding to position would exceed limit
             if position:
                 new_position_value = (position.quantity + quantity) * price
-                if new_position_value > portfolio_value * settings.max_position_size:
+                if new_position_value > portfolio_value * max_position_size:
                     return False, "Adding to position would exceed size limit"
         
         elif side == "SELL":
@@ -122,19 +170,33 @@ def check_risk_limits(symbol: str, side: str, quantity: float, price: float, db:
         return False, str(e)
 
 
-def execute_order(order: Order, db: Session) -> bool:
-    """Execute an order."""
+def get_latest_prices(symbols: list[str], db: Session) -> dict[str, float]:
+    """Get the latest close for each symbol, from the price cache with a database fallback."""
+    symbols = list(symbols)
+    prices = get_last_prices(symbols)
+    
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        rows = db.execute(LATEST_PRICES_SQL, {"symbols": missing}).all()
+        prices.update({row.symbol: row.close for row in rows})
+    return prices
+
+
+def get_latest_price(symbol: str, db: Session) -> Optional[float]:
+    """Get the latest close for a symbol, or None without market data."""
+    return get_latest_prices([symbol], db).get(symbol)
+
+
+def execute_order(order: Order, db: Session, execution_price: Optional[float] = None) -> bool:
+    """Execute an order, at execution_price if the caller already resolved it."""
     try:
         # Get current market price
-        market_data = db.query(MarketDataPoint).filter(
-            MarketDataPoint.symbol == order.symbol
-        ).order_by(MarketDataPoint.timestamp.desc()).first()
-        
-        if not market_data:
-            logger.error(f"No market data for {order.symbol}")
-            return False
-        
-        execution_price = market_data.close
+        if execution_price is None:
+            execution_price = get_latest_price(order.symbol, db)
+            
+            if execution_price is None:
+                logger.error(f"No market data for {order.symbol}")
+                return False
         
         # For limit orders, check if price is acceptable
         if order.order_type == "LIMIT":
@@ -145,70 +207,18 @@ def execute_order(order: Order, db: Session) -> bool:
                 logger.info(f"Limit order not executed. Market price {execution_price} < limit {order.price}")
                 return False
         
-        # Execute the order
-        order.status = "FILLED"
-        order.filled_quantity = order.quantity
-        order.average_fill_price = execution_price
-        order.filled_at = datetime.utcnow()
-        db.commit()
-        
-        # Create trade record
-        trade = Trade(
-            order_id=order.id,
-            symbol=order.symbol,
-            side=order.side,
-            quantity=order.quantity,
-            price=execution_price,
-            commission=order.quantity * execution_price * 0.001,  # 0.1% commission
-            timestamp=datetime.utcnow()
-        )
-        db.add(trade)
-        
-        # Update position
-        position = db.query(Position).filter(Position.symbol == order.symbol).first()
-        
-        if order.side == "BUY":
-            if position:
-                # Update existing position
-                total_cost = (position.quantity * position.average_price) + (order.quantity * execution_price)
-                total_quantity = position.quantity + order.quantity
-                position.average_price = total_cost / total_quantity
-                position.quantity = total_quantity
-                position.current_price = execution_price
-            else:
-                # Create new position
-                position = Position(
-                    symbol=order.symbol,
-                    quantity=order.quantity,
-                    average_price=execution_price,
-                    current_price=execution_price,
-                    unrealized_pnl=0.0
-                )
-                db.add(position)
-        else:  # SELL
-            if position:
-                # Calculate realized PnL
-                realized_pnl = (execution_price - position.average_price) * order.quantity
-                position.realized_pnl += realized_pnl
-                position.quantity -= order.quantity
-                position.current_price = execution_price
-                
-                # Remove position if fully closed
-                if position.quantity <= 0:
-                    db.delete(position)
-        
-        # Update account cash
-        account = db.query(Account).first()
-        if order.side == "BUY":
-            account.cash -= (order.quantity * execution_price + trade.commission)
-        else:  # SELL
-            account.cash += (order.quantity * execution_price - trade.commission)
-        
-        db.commit()
+        # Order, trade, position, account and portfolio value in one round trip
+        filled = db.execute(
+            text("SELECT execute_fill(:order_id, :price)"),
+            {"order_id": order.id, "price": execution_price}
+        ).scalar()
+        if not filled:
+            logger.info(f"Order {order.order_id} is no longer pending")
+            return False
         
-        # Update portfolio value using stored procedure
-        db.execute(text("SELECT update_portfolio_value()"))
+        # The whole fill is one transaction with a single WAL flush
         db.commit()
+        bump_portfolio_version()
         
         logger.info(f"Order {order.order_id} executed: {order.side} {order.quantity} {order.symbol} @ ${execution_price:.2f}")
         return True
@@ -219,102 +229,114 @@ def execute_order(order: Order, db: Session) -> bool:
         return False
 
 
-def process_trading_signals():
-    """Process trading signals from Kafka."""
-    def process_signal(signal_data: dict, key: Optional[str]):
+async def process_trading_signals():
+    """Process trading signals from Kafka in micro-batches."""
+    while True:
         try:
-            from shared.models import TradingSignal
-            signal = TradingSignal(**signal_data)
-            
-            if signal.action == "HOLD":
-                return
-            
-            db = get_db_session()
+            messages = await kafka_consumer.get_batch(max_records=64)
+            if messages:
+                # Signal handling uses the synchronous session, so keep it off the event loop
+                await asyncio.to_thread(process_signals, messages)
+        except Exception as e:
+            logger.error(f"Error in consumer loop: {e}")
+            await asyncio.sleep(5)
+
+
+def process_signals(messages: list[tuple[bytes, Optional[str]]]):
+    """Execute a batch of trading signals in order."""
+    signals = []
+    for signal_data, key in messages:
+        try:
+            signal = TradingSignal.from_json_bytes(signal_data)
+            if signal.action != SignalAction.HOLD:
+                signals.append(signal)
+        except Exception as e:
+            logger.error(f"Error in signal processing: {e}")
+    
+    if not signals:
+        return
+    
+    db = get_db_session()
+    try:
+        # Resolve prices once for the whole batch
+        prices = get_latest_prices({signal.symbol for signal in signals}, db)
+        
+        for signal in signals:
             try:
-                # Check risk limits
-                quantity = calculate_order_quantity(signal, db)
-                if quantity <= 0:
-                    logger.info(f"Order quantity too small for {signal.symbol}")
-                    return
-                
-                # Use current price for market orders
-                market_data = db.query(MarketDataPoint).filter(
-                    MarketDataPoint.symbol == signal.symbol
-                ).order_by(MarketDataPoint.timestamp.desc()).first()
-                
-                if not market_data:
-                    logger.error(f"No market data for {signal.symbol}")
-                    return
-                
-                price = market_data.close
-                
-                # Check risk limits
-                can_execute, reason = check_risk_limits(
-                    signal.symbol, signal.action, quantity, price, db
-                )
-                
-                if not can_execute:
-                    logger.warning(f"Order rejected for {signal.symbol}: {reason}")
-                    return
-                
-                # Create order
-                order = Order(
-                    order_id=str(uuid.uuid4()),
-                    symbol=signal.symbol,
-                    side=signal.action,
-                    order_type="MARKET",
-                    quantity=quantity,
-                    price=None,
-                    status="PENDING",
-                    timestamp=datetime.utcnow()
-                )
-                db.add(order)
-                db.commit()
-                
-                # Execute order
-                if execute_order(order, db):
-                    logger.info(f"Order executed from signal: {signal.action} {quantity} {signal.symbol}")
-                else:
-                    order.status = "REJECTED"
-                    db.commit()
-                    
+                process_signal(signal, prices.get(signal.symbol), db)
             except Exception as e:
                 db.rollback()
                 logger.error(f"Error processing signal: {e}")
-            finally:
-                db.close()
-                
-        except Exception as e:
-            logger.error(f"Error in signal processing: {e}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error processing signal batch: {e}")
+    finally:
+        db.close()
+
+
+def process_signal(signal: TradingSignal, price: Optional[float], db: Session):
+    """Turn one trading signal into an order and execute it."""
+    # Use current price for market orders
+    if price is None:
+        logger.error(f"No market data for {signal.symbol}")
+        return
     
-    while True:
-        try:
-            kafka_consumer.consume(process_signal)
-        except Exception as e:
-            logger.error(f"Error in consumer loop: {e}")
-            time.sleep(5)
+    # One locked read of the account serves sizing, the risk check and the fill
+    account = db.query(Account).with_for_update().first()
+    
+    quantity = calculate_order_quantity(signal, account, price)
+    if quantity <= 0:
+        logger.info(f"Order quantity too small for {signal.symbol}")
+        db.rollback()
+        return
+    
+    # Check risk limits
+    can_execute, reason = check_risk_limits(
+        signal.symbol, signal.action.value, quantity, price, db, account=account
+    )
+    
+    if not can_execute:
+        logger.warning(f"Order rejected for {signal.symbol}: {reason}")
+        # Release the row locks for the other workers
+        db.rollback()
+        return
+    
+    # Create order
+    order = Order(
+        order_id=str(uuid.uuid4()),
+        symbol=signal.symbol,
+        side=signal.action.value,
+        order_type="MARKET",
+        quantity=quantity,
+        price=None,
+        status="PENDING",
+        timestamp=utc_now()
+    )
+    db.add(order)
+    db.flush()
+    
+    # Execute order; the fill or rejection commit releases the risk-check row locks
+    if execute_order(order, db, execution_price=price):
+        logger.info(f"Order executed from signal: {signal.action.value} {quantity} {signal.symbol}")
+    else:
+        # A failed fill rolls back and discards the flushed order; re-add it so
+        # the rejection is still recorded
+        order.status = "REJECTED"
+        db.add(order)
+        db.commit()
 
 
-def calculate_order_quantity(signal, db: Session) -> float:
+def calculate_order_quantity(signal: TradingSignal, account: Optional[Account], price: float) -> float:
     """Calculate order quantity based on signal and risk limits."""
+    max_position_size = settings.max_position_size
     try:
-        account = db.query(Account).first()
         if not account:
             return 0.0
         
         # Use a percentage of portfolio for position sizing
         portfolio_value = account.total_value
-        position_value = portfolio_value * settings.max_position_size * signal.confidence
+        position_value = portfolio_value * max_position_size * signal.confidence
         
-        # Get current price
-        market_data = db.query(MarketDataPoint).filter(
-            MarketDataPoint.symbol == signal.symbol
-        ).order_by(MarketDataPoint.timestamp.desc()).first()
-        
-        if not market_data:
-            return 0.0
-        
-        price = market_data.close
         quantity = position_value / price
         
         # Round to reasonable precision
@@ -324,38 +346,53 @@ def calculate_order_quantity(signal, db: Session) -> float:
         return 0.0
 
 
-def update_positions_prices():
-    """Periodically update position prices and PnL."""
-    while True:
+async def update_positions_prices():
+    """Update position prices and PnL."""
+    async with AsyncSessionLocal() as db:
         try:
-            time.sleep(60)  # Update every minute
-            db = get_db_session()
-            try:
-                positions = db.query(Position).all()
-                for position in positions:
-                    # Get latest market price
-                    market_data = db.query(MarketDataPoint).filter(
-                        MarketDataPoint.symbol == position.symbol
-                    ).order_by(MarketDataPoint.timestamp.desc()).first()
-                    
-                    if market_data:
-                        position.current_price = market_data.close
-                        position.unrealized_pnl = (market_data.close - position.average_price) * position.quantity
-                        position.last_updated = datetime.utcnow()
-                
-                db.commit()
-                
-                # Update portfolio value
-                db.execute(text("SELECT update_portfolio_value()"))
-                db.commit()
-                
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Error updating positions: {e}")
-            finally:
-                db.close()
+            # The positions update trigger refreshes the portfolio value, locking
+            # the account after the positions; take that lock first instead
+            await db.execute(LOCK_ACCOUNT_SQL)
+            await db.execute(UPDATE_POSITION_PRICES_SQL)
+            await db.commit()
+            bump_portfolio_version()
         except Exception as e:
-            logger.error(f"Error in position update loop: {e}")
+            await db.rollback()
+            logger.error(f"Error updating positions: {e}")
+
+
+def bump_portfolio_version():
+    """Invalidate cached portfolio responses after a committed write."""
+    try:
+        redis_client.incr(PORTFOLIO_VERSION_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Could not bump portfolio version: {e}")
+
+
+def check_not_modified(request: Request, response: Response) -> Optional[Response]:
+    """Return a 304 if the client's ETag matches the portfolio version, else tag the response."""
+    try:
+        version = redis_client.get(PORTFOLIO_VERSION_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Portfolio version unavailable: {e}")
+        return None
+    
+    etag = f'W/"{version or 0}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+def load_position_models(db: Session) -> list[PositionModel]:
+    """Read the response columns of every position, skipping re-validation of DB values."""
+    rows = db.execute(
+        select(
+            Position.symbol, Position.quantity, Position.average_price, Position.current_price,
+            Position.unrealized_pnl, Position.realized_pnl, Position.last_updated
+        )
+    ).all()
+    return [PositionModel.trusted(**row._mapping) for row in rows]
 
 
 @app.get("/")
@@ -384,14 +421,12 @@ async def create_order(order: OrderModel, background_tasks: BackgroundTasks):
             raise HTTPException(status_code=400, detail="Quantity must be positive")
         
         # Get execution price
-        market_data = db.query(MarketDataPoint).filter(
-            MarketDataPoint.symbol == order.symbol
-        ).order_by(MarketDataPoint.timestamp.desc()).first()
+        market_price = get_latest_price(order.symbol, db)
         
-        if not market_data:
+        if market_price is None:
             raise HTTPException(status_code=404, detail=f"No market data for {order.symbol}")
         
-        price = order.price if order.price else market_data.close
+        price = order.price if order.price else market_price
         
         # Check risk limits
         can_execute, reason = check_risk_limits(
@@ -401,8 +436,8 @@ async def create_order(order: OrderModel, background_tasks: BackgroundTasks):
         if not can_execute:
             raise HTTPException(status_code=400, detail=reason)
         
-        # Create order
-        db_order = Order(
+        # Create order; RETURNING hands back the generated columns without a refresh
+        values = dict(
             order_id=order.order_id or str(uuid.uuid4()),
             symbol=order.symbol,
             side=order.side.value,
@@ -412,25 +447,28 @@ async def create_order(order: OrderModel, background_tasks: BackgroundTasks):
             status=order.status.value,
             timestamp=order.timestamp
         )
-        db.add(db_order)
+        row = db.execute(
+            insert(Order).values(**values).returning(
+                Order.id, Order.filled_quantity, Order.average_fill_price
+            )
+        ).one()
         db.commit()
-        db.refresh(db_order)
         
         # Execute order in background if market order
         if order.order_type.value == "MARKET":
-            background_tasks.add_task(execute_order, db_order, db)
+            background_tasks.add_task(execute_order, Order(id=row.id, **values), db)
         
         return OrderModel(
-            order_id=db_order.order_id,
-            symbol=db_order.symbol,
+            order_id=values["order_id"],
+            symbol=order.symbol,
             side=order.side,
             order_type=order.order_type,
-            quantity=db_order.quantity,
-            price=db_order.price,
+            quantity=order.quantity,
+            price=order.price,
             status=order.status,
-            timestamp=db_order.timestamp,
-            filled_quantity=db_order.filled_quantity,
-            average_fill_price=db_order.average_fill_price
+            timestamp=order.timestamp,
+            filled_quantity=row.filled_quantity,
+            average_fill_price=row.average_fill_price
         )
     except HTTPException:
         raise
@@ -452,7 +490,7 @@ async def get_order(order_id: str):
             raise HTTPException(status_code=404, detail="Order not found")
         
         from shared.models import OrderSide, OrderType, OrderStatus
-        return OrderModel(
+        return OrderModel.trusted(
             order_id=order.order_id,
             symbol=order.symbol,
             side=OrderSide(order.side),
@@ -469,68 +507,62 @@ async def get_order(order_id: str):
 
 
 @app.get("/positions", response_model=List[PositionModel])
-async def get_positions():
+async def get_positions(request: Request, response: Response):
     """Get all positions."""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     db = get_db_session()
     try:
-        positions = db.query(Position).all()
-        return [
-            PositionModel(
-                symbol=p.symbol,
-                quantity=p.quantity,
-                average_price=p.average_price,
-                current_price=p.current_price,
-                unrealized_pnl=p.unrealized_pnl,
-                realized_pnl=p.realized_pnl,
-                last_updated=p.last_updated
-            )
-            for p in positions
-        ]
+        return Response(
+            content=PositionList.dump_json(load_position_models(db)),
+            media_type="application/json",
+            headers=dict(response.headers)
+        )
     finally:
         db.close()
 
 
 @app.get("/portfolio", response_model=PortfolioModel)
-async def get_portfolio():
+async def get_portfolio(request: Request, response: Response):
     """Get current portfolio."""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     db = get_db_session()
     try:
         account = db.query(Account).first()
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
-        positions = db.query(Position).all()
-        position_models = [
-            PositionModel(
-                symbol=p.symbol,
-                quantity=p.quantity,
-                average_price=p.average_price,
-                current_price=p.current_price,
-                unrealized_pnl=p.unrealized_pnl,
-                realized_pnl=p.realized_pnl,
-                last_updated=p.last_updated
-            )
-            for p in positions
-        ]
+        position_models = load_position_models(db)
         
-        total_pnl = sum(p.unrealized_pnl + p.realized_pnl for p in positions)
+        total_pnl = db.execute(
+            select(func.coalesce(func.sum(Position.unrealized_pnl + Position.realized_pnl), 0.0))
+        ).scalar()
         total_return = (account.total_value - settings.initial_capital) / settings.initial_capital
         
-        return PortfolioModel(
+        return PortfolioModel.trusted(
             total_value=account.total_value,
             cash=account.cash,
-            positions=position_models,
+            positions={position.symbol: position for position in position_models},
             total_pnl=total_pnl,
             total_return=total_return,
-            timestamp=datetime.utcnow()
-        )
+            timestamp=utc_now()
+        ).to_response(headers=dict(response.headers))
     finally:
         db.close()
 
 
 @app.get("/account")
-async def get_account():
+async def get_account(request: Request, response: Response):
     """Get account information."""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     db = get_db_session()
     try:
         account = db.query(Account).first()
@@ -597,7 +629,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=settings.trading_service_port,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
 
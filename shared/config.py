@@ -1,5 +1,5 @@
 """Configuration management for all services."""
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
@@ -13,9 +13,9 @@ class Settings(BaseSettings):
     postgres_password: str = "secure_password_123"
     postgres_db: str = "algo_trading"
     
-    @property
-    def postgres_url(self) -> str:
-        return f"postgresql://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+    # Built once in model_post_init unless set explicitly
+    postgres_url: str = ""
+    postgres_async_url: str = ""
     
     # Kafka
     kafka_bootstrap_servers: str = "kafka:9092"
@@ -23,11 +23,19 @@ class Settings(BaseSettings):
     kafka_topic_trading_signals: str = "trading_signals"
     kafka_topic_anomalies: str = "anomalies"
     
+    # Redis
+    redis_host: str = "redis"
+    redis_port: int = 6379
+    price_cache_ttl_seconds: int = 90  # outlives one ingestion interval
+    
     # Alpaca API
     alpaca_api_key: Optional[str] = None
     alpaca_secret_key: Optional[str] = None
     alpaca_base_url: str = "https://paper-api.alpaca.markets"
     
+    # Market data cache
+    yfinance_cache_dir: str = "/tmp/yf_cache"
+    
     # Trading Configuration
     initial_capital: float = 100000.0
     max_position_size: float = 0.1  # 10% of portfolio
@@ -51,9 +59,15 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_format: str = "json"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    def model_post_init(self, __context) -> None:
+        """Assemble the database URLs from their parts."""
+        credentials = f"{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+        if not self.postgres_url:
+            self.postgres_url = f"postgresql+psycopg://{credentials}"
+        if not self.postgres_async_url:
+            self.postgres_async_url = f"postgresql+asyncpg://{credentials}"
+    
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
 
 settings = Settings()
@@ -2,21 +2,40 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from contextlib import contextmanager
+from typing import Iterator
 from shared.config import settings
 
 # Create database engine
+# LIFO reuse keeps a small set of warm connections whose prepared statements
+# stay cached; statements run prepare_threshold times are prepared server-side
+# (not 0: multi-statement DDL in init_db cannot be prepared)
 engine = create_engine(
     settings.postgres_url,
-    pool_size=10,
-    max_overflow=20,
+    connect_args={"prepare_threshold": 5},
+    pool_size=32,
+    max_overflow=64,
+    pool_use_lifo=True,
     pool_pre_ping=True,
+    pool_recycle=1800,
     echo=False
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and session factory for code running on the event loop
+async_engine = create_async_engine(
+    settings.postgres_async_url,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=False
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -39,3 +58,11 @@ def get_db_session() -> Session:
     """Get a database session."""
     return SessionLocal()
 
+
+def get_session() -> Iterator[Session]:
+    """FastAPI dependency yielding a pooled session for one request."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
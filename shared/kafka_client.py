@@ -1,12 +1,23 @@
 """Kafka producer and consumer utilities."""
-from kafka import KafkaProducer, KafkaConsumer
+from kafka import KafkaProducer
+from aiokafka import AIOKafkaConsumer
 from kafka.errors import KafkaError
-import json
-import logging
-from typing import Optional, Callable
+import orjson
+from typing import Callable, Optional, Union
 from shared.config import settings
+from shared.logger import setup_logger
 
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
+
+
+def serialize_value(value: Union[dict, bytes]) -> bytes:
+    """Encode a message as JSON bytes; NumPy scalars and arrays are encoded natively.
+    
+    Already-encoded payloads (e.g. from WireModel.to_json_bytes) pass through.
+    """
+    if isinstance(value, bytes):
+        return value
+    return orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
 
 
 class KafkaProducerClient:
@@ -15,54 +26,90 @@ class KafkaProducerClient:
     def __init__(self):
         self.producer = KafkaProducer(
             bootstrap_servers=settings.kafka_bootstrap_servers.split(','),
-            value_serializer=lambda v: json.dumps(v, default=str).encode('utf-8'),
+            value_serializer=serialize_value,
             key_serializer=lambda k: k.encode('utf-8') if k else None,
             acks='all',
             retries=3,
-            max_in_flight_requests_per_connection=1
+            max_in_flight_requests_per_connection=1,
+            linger_ms=5,
+            batch_size=131072,
+            compression_type='lz4'
         )
     
-    def send(self, topic: str, value: dict, key: Optional[str] = None):
-        """Send a message to a topic."""
+    def send(self, topic: str, value: Union[dict, bytes], key: Optional[str] = None):
+        """Queue a message for a topic; delivery failures are logged asynchronously."""
         try:
             future = self.producer.send(topic, value=value, key=key)
-            future.get(timeout=10)
-            logger.debug(f"Message sent to topic {topic}")
+            future.add_errback(
+                lambda e: logger.error(f"Failed to send message to {topic}: {e}")
+            )
         except KafkaError as e:
             logger.error(f"Failed to send message to {topic}: {e}")
             raise
     
+    def send_batch(self, topic: str, messages: list[tuple[Union[dict, bytes], Optional[str]]]):
+        """Send (value, key) messages to a topic and wait for them with one flush."""
+        try:
+            futures = [
+                self.producer.send(topic, value=value, key=key)
+                for value, key in messages
+            ]
+            self.producer.flush(timeout=10)
+            for future in futures:
+                future.get(timeout=0)
+            logger.debug("%d messages sent to topic %s", len(futures), topic)
+        except KafkaError as e:
+            logger.error(f"Failed to send batch to {topic}: {e}")
+            raise
+    
     def close(self):
-        """Close the producer."""
+        """Flush queued messages and close the producer."""
+        self.producer.flush(timeout=1)
         self.producer.close()
 
 
 class KafkaConsumerClient:
-    """Kafka consumer for subscribing to topics."""
+    """Kafka consumer for subscribing to topics from the event loop."""
     
-    def __init__(self, topics: list[str], group_id: str):
-        self.consumer = KafkaConsumer(
+    def __init__(
+        self,
+        topics: list[str],
+        group_id: str,
+        value_deserializer: Optional[Callable[[bytes], object]] = orjson.loads
+    ):
+        # Pass value_deserializer=None to receive raw bytes, e.g. for model_validate_json
+        self.consumer = AIOKafkaConsumer(
             *topics,
             bootstrap_servers=settings.kafka_bootstrap_servers.split(','),
             group_id=group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            value_deserializer=value_deserializer,
             key_deserializer=lambda k: k.decode('utf-8') if k else None,
             auto_offset_reset='latest',
-            enable_auto_commit=True,
-            consumer_timeout_ms=1000
+            enable_auto_commit=True
         )
         self.topics = topics
     
-    def consume(self, callback: Callable[[dict, Optional[str]], None]):
-        """Consume messages and call callback for each message."""
+    async def start(self):
+        """Connect and join the consumer group."""
+        await self.consumer.start()
+    
+    async def get_batch(self, max_records: int = 64, timeout_ms: int = 100) -> list[tuple[object, Optional[str]]]:
+        """Wait up to timeout_ms for messages and return them as (value, key) pairs.
+        
+        Returns as soon as any message is available, so idle polls do not hold
+        messages back for the full timeout.
+        """
         try:
-            for message in self.consumer:
-                callback(message.value, message.key)
+            records = await self.consumer.getmany(timeout_ms=timeout_ms, max_records=max_records)
         except Exception as e:
             logger.error(f"Error consuming messages: {e}")
             raise
+        return [
+            (message.value, message.key)
+            for partition_messages in records.values()
+            for message in partition_messages
+        ]
     
-    def close(self):
+    async def close(self):
         """Close the consumer."""
-        self.consumer.close()
-
+        await self.consumer.stop()
@@ -1,28 +1,33 @@
 """Logging configuration."""
 import logging
-import sys
-from pythonjsonlogger import jsonlogger
+import orjson
+import structlog
+from structlog.typing import FilteringBoundLogger
 from shared.config import settings
 
+# Configured once at import; filtered levels become no-op methods
+if settings.log_format == "json":
+    renderer = structlog.processors.JSONRenderer(serializer=orjson.dumps)
+    logger_factory = structlog.BytesLoggerFactory()
+else:
+    renderer = structlog.dev.ConsoleRenderer(colors=False)
+    logger_factory = structlog.PrintLoggerFactory()
+
+structlog.configure(
+    processors=[
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.format_exc_info,
+        renderer
+    ],
+    wrapper_class=structlog.make_filtering_bound_logger(
+        getattr(logging, settings.log_level.upper())
+    ),
+    logger_factory=logger_factory,
+    cache_logger_on_first_use=True
+)
 
-def setup_logger(name: str) -> logging.Logger:
-    """Set up a logger with JSON formatting."""
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, settings.log_level.upper()))
-    
-    handler = logging.StreamHandler(sys.stdout)
-    
-    if settings.log_format == "json":
-        formatter = jsonlogger.JsonFormatter(
-            '%(asctime)s %(name)s %(levelname)s %(message)s'
-        )
-    else:
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-    
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    
-    return logger
 
+def setup_logger(name: str) -> FilteringBoundLogger:
+    """Set up a logger with JSON formatting."""
+    return structlog.get_logger().bind(logger=name)
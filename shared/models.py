@@ -1,8 +1,35 @@
 """Shared data models across services."""
-from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional, Literal
+from pydantic import (
+    AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, computed_field, field_validator, model_validator
+)
+from pydantic_core import ArgsKwargs
+from pydantic.dataclasses import dataclass
+from dataclasses import MISSING, fields
+from fastapi import Response
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Mapping, Optional
 from enum import Enum
+import math
+import numpy as np
+import pyarrow as pa
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Integer timestamps at or above this are nanoseconds (1973 in ns, year 5138 in us)
+EPOCH_NS_THRESHOLD = 10**17
+# Prices are held as integer ticks of 1/100th of a cent
+PRICE_SCALE = 10_000
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'vwap')
+
+
+def utc_now() -> datetime:
+    """Timezone-aware current time; datetime.utcnow() is naive and deprecated."""
+    return datetime.now(timezone.utc)
+
+
+def nan_to_none(value: float) -> Optional[float]:
+    """Map the NaN "missing" sentinel back to None, e.g. for nullable database columns."""
+    return None if math.isnan(value) else value
 
 
 class OrderSide(str, Enum):
@@ -24,58 +51,301 @@ class OrderStatus(str, Enum):
     REJECTED = "REJECTED"
 
 
-class MarketData(BaseModel):
+class SignalAction(str, Enum):
+    BUY = "BUY"
+    SELL = "SELL"
+    HOLD = "HOLD"
+
+
+class Severity(str, Enum):
+    LOW = "LOW"
+    MEDIUM = "MEDIUM"
+    HIGH = "HIGH"
+    CRITICAL = "CRITICAL"
+
+
+class DeferredModel(BaseModel):
+    """Base for the shared models; schemas are built on first use, not at import."""
+    model_config = ConfigDict(defer_build=True)
+    
+    @classmethod
+    def trusted(cls, **values):
+        """Build from values already validated upstream (database rows, ingress models), skipping validation."""
+        return cls.model_construct(**values)
+
+
+class WireModel(DeferredModel):
+    """Model exchanged as JSON bytes over Kafka and HTTP."""
+    
+    @classmethod
+    def from_json_bytes(cls, data: bytes):
+        """Parse and validate raw JSON in one pass, without an intermediate dict."""
+        return cls.model_validate_json(data)
+    
+    def to_json_bytes(self) -> bytes:
+        """Serialize directly to JSON bytes."""
+        return self.model_dump_json().encode()
+
+
+class FastJSONMixin:
+    """Render a model as a JSON response, skipping FastAPI's jsonable_encoder pass."""
+    
+    def to_response(self, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+        """Build the response straight from the Rust serializer."""
+        return Response(
+            content=self.model_dump_json(),
+            media_type="application/json",
+            status_code=status_code,
+            headers=headers
+        )
+
+
+# Columnar wire format for market data batches
+MARKET_DATA_ARROW_SCHEMA = pa.schema([
+    ("symbol", pa.dictionary(pa.int32(), pa.string())),
+    ("timestamp_us", pa.int64()),
+    ("open_ticks", pa.int64()),
+    ("high_ticks", pa.int64()),
+    ("low_ticks", pa.int64()),
+    ("close_ticks", pa.int64()),
+    ("volume", pa.int64()),
+    ("vwap_ticks", pa.int64())
+])
+MARKET_DATA_NULLABLE_COLUMNS = frozenset({"vwap_ticks"})
+
+
+# Structured row layout for vectorized indicator math over a symbol's bars
+MARKET_DATA_DTYPE = np.dtype([
+    ("timestamp_us", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "i8"),
+    ("vwap", "f8")
+])
+
+
+# A slotted dataclass rather than a BaseModel: one is allocated per tick, so
+# dropping the per-instance __dict__ keeps the stream's allocations small.
+# The time is kept as integer epoch microseconds; no datetime is built or
+# formatted per tick unless the timestamp property is read. A bar never
+# changes, so instances are frozen and hashable. Prices are stored as int64
+# ticks of 1/PRICE_SCALE so they compare exactly; the float accessors are
+# derived on read.
+@dataclass(slots=True, frozen=True)
+class MarketData:
     """Market data point from data ingestion."""
     symbol: str
-    timestamp: datetime
-    open: float
-    high: float
-    low: float
-    close: float
+    timestamp_us: Annotated[int, Field(validation_alias=AliasChoices('timestamp_us', 'timestamp'))]
+    open_ticks: int
+    high_ticks: int
+    low_ticks: int
+    close_ticks: int
     volume: int
-    vwap: Optional[float] = None
+    vwap_ticks: Optional[int] = None
+    
+    @model_validator(mode='before')
+    @classmethod
+    def quantize_prices(cls, values):
+        """Accept float prices (open, close, ...) and convert them to ticks.
+        
+        A non-finite vwap means missing, as elsewhere NaN does; a non-finite
+        OHLC price is rejected.
+        """
+        kwargs = dict(values.kwargs or {}) if isinstance(values, ArgsKwargs) else dict(values)
+        for name in PRICE_FIELDS:
+            price = kwargs.pop(name, None)
+            ticks_name = f"{name}_ticks"
+            if price is None or ticks_name in kwargs:
+                continue
+            price = float(price)
+            if not math.isfinite(price):
+                if name == 'vwap':
+                    continue
+                raise ValueError(f"{name} must be a finite price, got {price}")
+            kwargs[ticks_name] = round(price * PRICE_SCALE)
+        if isinstance(values, ArgsKwargs):
+            return ArgsKwargs(values.args, kwargs)
+        return kwargs
+    
+    @field_validator('timestamp_us', mode='before')
+    @classmethod
+    def parse_timestamp(cls, value):
+        """Accept epoch ns (the market data topic's wire format), epoch us, datetimes or ISO strings."""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return (value - EPOCH) // timedelta(microseconds=1)
+        if isinstance(value, int) and abs(value) >= EPOCH_NS_THRESHOLD:
+            return value // 1000
+        return value
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Bar time as an aware UTC datetime."""
+        return EPOCH + timedelta(microseconds=self.timestamp_us)
+    
+    @classmethod
+    def trusted(cls, **values) -> "MarketData":
+        """Build from already-validated field values (ticks, epoch us), skipping validation."""
+        item = object.__new__(cls)
+        for field in fields(cls):
+            if field.name in values:
+                value = values[field.name]
+            elif field.default is not MISSING:
+                value = field.default
+            elif field.default_factory is not MISSING:
+                value = field.default_factory()
+            else:
+                raise KeyError(f"Missing required MarketData field {field.name}")
+            object.__setattr__(item, field.name, value)
+        return item
+    
+    @computed_field
+    @property
+    def open(self) -> float:
+        return self.open_ticks / PRICE_SCALE
+    
+    @computed_field
+    @property
+    def high(self) -> float:
+        return self.high_ticks / PRICE_SCALE
+    
+    @computed_field
+    @property
+    def low(self) -> float:
+        return self.low_ticks / PRICE_SCALE
+    
+    @computed_field
+    @property
+    def close(self) -> float:
+        return self.close_ticks / PRICE_SCALE
+    
+    @computed_field
+    @property
+    def vwap(self) -> Optional[float]:
+        return None if self.vwap_ticks is None else self.vwap_ticks / PRICE_SCALE
+    
+    @staticmethod
+    def pack_batch(items: list["MarketData"]) -> bytes:
+        """Encode a batch as one columnar Arrow IPC stream."""
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array([item.symbol for item in items], pa.string()).dictionary_encode(),
+                pa.array([item.timestamp_us for item in items], pa.int64()),
+                pa.array([item.open_ticks for item in items], pa.int64()),
+                pa.array([item.high_ticks for item in items], pa.int64()),
+                pa.array([item.low_ticks for item in items], pa.int64()),
+                pa.array([item.close_ticks for item in items], pa.int64()),
+                pa.array([item.volume for item in items], pa.int64()),
+                pa.array([item.vwap_ticks for item in items], pa.int64())
+            ],
+            schema=MARKET_DATA_ARROW_SCHEMA
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, MARKET_DATA_ARROW_SCHEMA) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    
+    @staticmethod
+    def unpack_batch(data: bytes) -> list["MarketData"]:
+        """Decode an Arrow IPC stream from pack_batch.
+        
+        The schema and null checks stand in for per-field validation: Arrow has
+        already typed every column, so rows are built with trusted().
+        """
+        table = pa.ipc.open_stream(data).read_all()
+        if not table.schema.equals(MARKET_DATA_ARROW_SCHEMA):
+            raise ValueError(f"Unexpected market data schema: {table.schema}")
+        names = table.schema.names
+        for name in names:
+            if name not in MARKET_DATA_NULLABLE_COLUMNS and table.column(name).null_count:
+                raise ValueError(f"Null values in required market data column {name}")
+        columns = [table.column(name).to_pylist() for name in names]
+        return [MarketData.trusted(**dict(zip(names, row))) for row in zip(*columns)]
+    
+    @staticmethod
+    def to_numpy(items: list["MarketData"]) -> np.ndarray:
+        """Pack points into a MARKET_DATA_DTYPE structured array; a missing vwap becomes NaN."""
+        return np.fromiter(
+            (
+                (item.timestamp_us, item.open, item.high, item.low, item.close, item.volume,
+                 math.nan if item.vwap_ticks is None else item.vwap)
+                for item in items
+            ),
+            dtype=MARKET_DATA_DTYPE,
+            count=len(items)
+        )
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @staticmethod
+    def from_numpy(symbol: str, rows: np.ndarray) -> list["MarketData"]:
+        """Rebuild one symbol's points from a to_numpy array."""
+        return MarketDataList.validate_python([
+            {
+                "symbol": symbol,
+                "timestamp_us": timestamp_us,
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume,
+                "vwap": None if math.isnan(vwap_) else vwap_
+            }
+            for timestamp_us, open_, high, low, close, volume, vwap_ in zip(
+                rows["timestamp_us"].tolist(), rows["open"].tolist(), rows["high"].tolist(),
+                rows["low"].tolist(), rows["close"].tolist(), rows["volume"].tolist(), rows["vwap"].tolist()
+            )
+        ])
+    
+    @classmethod
+    def from_json_bytes(cls, data: bytes) -> "MarketData":
+        """Parse and validate raw JSON in one pass, without an intermediate dict."""
+        return MarketDataAdapter.validate_json(data)
+    
+    def to_json_bytes(self) -> bytes:
+        """Serialize directly to JSON bytes."""
+        return MarketDataAdapter.dump_json(self)
+
 
+MarketDataAdapter = TypeAdapter(MarketData)
 
-class TradingSignal(BaseModel):
+
+class TradingSignal(WireModel):
     """Trading signal from ML service."""
     symbol: str
     timestamp: datetime
-    action: Literal["BUY", "SELL", "HOLD"]
+    action: SignalAction
     confidence: float = Field(ge=0.0, le=1.0)
-    predicted_price: Optional[float] = None
+    # Missing prices are NaN rather than None, so every price is a plain float;
+    # NaN is still written as null on the wire
+    predicted_price: float = math.nan
     current_price: float
-    stop_loss: Optional[float] = None
-    take_profit: Optional[float] = None
+    stop_loss: float = math.nan
+    take_profit: float = math.nan
     model_version: str = "v1.0"
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_validator('predicted_price', 'stop_loss', 'take_profit', mode='before')
+    @classmethod
+    def none_to_nan(cls, value):
+        """Accept null from existing producers."""
+        return math.nan if value is None else value
 
 
-class AnomalyAlert(BaseModel):
+class AnomalyAlert(WireModel):
     """Anomaly detection alert."""
     symbol: str
     timestamp: datetime
     anomaly_score: float
     anomaly_type: str
     description: str
-    severity: Literal["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    severity: Severity
     market_data: MarketData
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class Order(BaseModel):
+class Order(WireModel):
     """Trading order."""
     order_id: Optional[str] = None
     symbol: str
@@ -84,17 +354,12 @@ class Order(BaseModel):
     quantity: float
     price: Optional[float] = None  # For limit orders
     status: OrderStatus = OrderStatus.PENDING
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
     filled_quantity: float = 0.0
     average_fill_price: Optional[float] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class Position(BaseModel):
+class Position(FastJSONMixin, DeferredModel):
     """Portfolio position."""
     symbol: str
     quantity: float
@@ -102,31 +367,32 @@ class Position(BaseModel):
     current_price: float
     unrealized_pnl: float
     realized_pnl: float = 0.0
-    last_updated: datetime = Field(default_factory=datetime.utcnow)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    last_updated: datetime = Field(default_factory=utc_now)
 
 
-class Portfolio(BaseModel):
+class Portfolio(FastJSONMixin, DeferredModel):
     """Portfolio snapshot."""
     total_value: float
     cash: float
-    positions: list[Position]
+    positions: dict[str, Position]  # keyed by symbol
     total_pnl: float
     total_return: float
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_validator('positions')
+    @classmethod
+    def check_position_keys(cls, positions: dict[str, Position]) -> dict[str, Position]:
+        """Each position must be keyed by its own symbol."""
+        for symbol, position in positions.items():
+            if symbol != position.symbol:
+                raise ValueError(f"Position for {position.symbol} keyed as {symbol}")
+        return positions
 
 
-class BacktestResult(BaseModel):
+class BacktestResult(FastJSONMixin, DeferredModel):
     """Backtesting results."""
+    model_config = ConfigDict(defer_build=True, frozen=True)
+    
     strategy_name: str
     start_date: datetime
     end_date: datetime
@@ -141,9 +407,14 @@ class BacktestResult(BaseModel):
     losing_trades: int
     average_win: float
     average_loss: float
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
+
+# Batch validators, built once; validating a whole list is a single pass
+MarketDataList = TypeAdapter(list[MarketData])
+PositionList = TypeAdapter(list[Position])
+TradingSignalList = TypeAdapter(list[TradingSignal])
+
+
+def dump_json_list(items: list[MarketData]) -> bytes:
+    """Serialize a batch of market data points to JSON bytes."""
+    return MarketDataList.dump_json(items)
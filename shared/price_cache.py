@@ -0,0 +1,54 @@
+"""Latest market price cache shared between services through Redis."""
+from typing import Optional
+import redis
+from shared.config import settings
+from shared.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+redis_client = redis.Redis(
+    host=settings.redis_host,
+    port=settings.redis_port,
+    decode_responses=True,
+    socket_timeout=0.5
+)
+
+
+def price_key(symbol: str) -> str:
+    """Redis key holding the latest close for a symbol."""
+    return f"shared:market:{symbol}:last"
+
+
+def get_last_prices(symbols: list[str]) -> dict[str, float]:
+    """Get cached latest prices; symbols missing from the cache are left out."""
+    if not symbols:
+        return {}
+    try:
+        values = redis_client.mget([price_key(symbol) for symbol in symbols])
+    except redis.RedisError as e:
+        logger.warning(f"Price cache unavailable: {e}")
+        return {}
+    return {symbol: float(value) for symbol, value in zip(symbols, values) if value is not None}
+
+
+def get_last_price(symbol: str) -> Optional[float]:
+    """Get the cached latest price for a symbol, or None on a miss."""
+    return get_last_prices([symbol]).get(symbol)
+
+
+def set_last_prices(prices: dict[str, float]):
+    """Cache latest prices with the configured TTL in one round trip."""
+    if not prices:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for symbol, price in prices.items():
+            pipe.set(price_key(symbol), price, ex=settings.price_cache_ttl_seconds)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not update price cache: {e}")
+
+
+def set_last_price(symbol: str, price: float):
+    """Cache the latest price for a symbol."""
+    set_last_prices({symbol: price})
@@ -1,29 +1,57 @@
 """Basic tests for shared models."""
+import math
+import numpy as np
+import pyarrow as pa
 import pytest
-from datetime import datetime
-from shared.models import MarketData, TradingSignal, Order, OrderSide, OrderType, OrderStatus
+from datetime import datetime, timezone
+from shared.models import (
+    MarketData, MarketDataList, TradingSignal, Order, OrderSide, OrderType, OrderStatus,
+    Position, Portfolio, SignalAction, MARKET_DATA_ARROW_SCHEMA, MARKET_DATA_DTYPE, dump_json_list
+)
 
 
-def test_market_data():
+@pytest.fixture(scope="session")
+def now():
+    """One fixed UTC timestamp shared by every test."""
+    return datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("symbol,close", [("AAPL", 151.0), ("MSFT", 300.0), ("GOOG", 140.0)])
+def test_market_data(now, symbol, close):
     """Test MarketData model."""
+    data = MarketData(
+        symbol=symbol,
+        timestamp=now,
+        open=150.0,
+        high=max(152.0, close),
+        low=min(149.0, close),
+        close=close,
+        volume=1000000
+    )
+    assert data.symbol == symbol
+    assert data.close == close
+    assert data.timestamp == now
+
+
+def test_market_data_epoch_ns():
+    """Test MarketData accepts epoch nanosecond timestamps."""
     data = MarketData(
         symbol="AAPL",
-        timestamp=datetime.utcnow(),
+        timestamp=1700000000123456000,
         open=150.0,
         high=152.0,
         low=149.0,
         close=151.0,
         volume=1000000
     )
-    assert data.symbol == "AAPL"
-    assert data.close == 151.0
+    assert data.timestamp == datetime(2023, 11, 14, 22, 13, 20, 123456, tzinfo=timezone.utc)
 
 
-def test_trading_signal():
+def test_trading_signal(now):
     """Test TradingSignal model."""
     signal = TradingSignal(
         symbol="AAPL",
-        timestamp=datetime.utcnow(),
+        timestamp=now,
         action="BUY",
         confidence=0.8,
         current_price=150.0,
@@ -45,3 +73,250 @@ def test_order():
     assert order.side == OrderSide.BUY
     assert order.quantity == 10.0
 
+
+def test_order_default_timestamp_is_utc():
+    """Test Order defaults to a timezone-aware UTC timestamp."""
+    order = Order(
+        symbol="AAPL",
+        side=OrderSide.SELL,
+        order_type=OrderType.LIMIT,
+        quantity=5.0,
+        price=150.0
+    )
+    assert order.timestamp.tzinfo == timezone.utc
+
+
+def test_trading_signal_json_bytes_round_trip():
+    """Test TradingSignal round-trips through JSON bytes."""
+    signal = TradingSignal(
+        symbol="AAPL",
+        timestamp=datetime(2024, 1, 2, 15, 30, tzinfo=timezone.utc),
+        action="SELL",
+        confidence=0.9,
+        current_price=150.0
+    )
+    payload = signal.to_json_bytes()
+    assert isinstance(payload, bytes)
+    assert TradingSignal.from_json_bytes(payload) == signal
+
+
+def test_market_data_json_bytes_round_trip():
+    """Test MarketData round-trips through JSON bytes without an instance dict."""
+    data = MarketData.from_json_bytes(
+        b'{"symbol":"AAPL","timestamp":1700000000123456000,"open":150.0,'
+        b'"high":152.0,"low":149.0,"close":151.0,"volume":1000000}'
+    )
+    assert not hasattr(data, "__dict__")
+    assert MarketData.from_json_bytes(data.to_json_bytes()) == data
+
+
+def test_market_data_list_adapter():
+    """Test batch validation and serialization of market data."""
+    rows = [
+        {"symbol": symbol, "timestamp": 1700000000000000000, "open": 1.0,
+         "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10}
+        for symbol in ("AAPL", "MSFT")
+    ]
+    batch = MarketDataList.validate_python(rows)
+    assert [data.symbol for data in batch] == ["AAPL", "MSFT"]
+    assert MarketDataList.validate_json(dump_json_list(batch)) == batch
+
+
+def test_trading_signal_action_enum(now):
+    """Test TradingSignal validates actions into SignalAction."""
+    signal = TradingSignal(
+        symbol="AAPL",
+        timestamp=now,
+        action="HOLD",
+        confidence=0.5,
+        current_price=150.0
+    )
+    assert signal.action is SignalAction.HOLD
+    with pytest.raises(ValueError):
+        TradingSignal(
+            symbol="AAPL",
+            timestamp=now,
+            action="SHORT",
+            confidence=0.5,
+            current_price=150.0
+        )
+
+
+def test_market_data_timestamp_us():
+    """Test MarketData stores integer microseconds and serializes them as-is."""
+    data = MarketData(
+        symbol="AAPL",
+        timestamp="2023-11-14T22:13:20.123456+00:00",
+        open=150.0,
+        high=152.0,
+        low=149.0,
+        close=151.0,
+        volume=1000000
+    )
+    assert data.timestamp_us == 1700000000123456
+    assert b'"timestamp_us":1700000000123456' in data.to_json_bytes()
+
+
+def test_market_data_frozen():
+    """Test MarketData is immutable and hashable."""
+    data = MarketData(
+        symbol="AAPL",
+        timestamp=1700000000000000000,
+        open=150.0,
+        high=152.0,
+        low=149.0,
+        close=151.0,
+        volume=1000000
+    )
+    with pytest.raises(Exception):
+        data.close = 152.0
+    assert len({data, MarketData.from_json_bytes(data.to_json_bytes())}) == 1
+
+
+def test_market_data_arrow_batch_round_trip():
+    """Test market data batches survive the Arrow wire format."""
+    batch = MarketDataList.validate_python([
+        {"symbol": symbol, "timestamp": 1700000000000000000 + i, "open": 1.0,
+         "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10, "vwap": None}
+        for i, symbol in enumerate(("AAPL", "MSFT", "AAPL"))
+    ])
+    assert MarketData.unpack_batch(MarketData.pack_batch(batch)) == batch
+
+
+def test_market_data_price_ticks():
+    """Test MarketData quantizes float prices to integer ticks."""
+    data = MarketData(
+        symbol="AAPL",
+        timestamp=1700000000000000000,
+        open=0.1 + 0.2,
+        high=152.0,
+        low=149.0,
+        close=151.2345,
+        volume=1000000
+    )
+    assert data.open_ticks == 3000
+    assert data.close_ticks == 1512345
+    assert data.close == 151.2345
+    assert data.vwap is None
+    assert MarketData.from_json_bytes(data.to_json_bytes()) == data
+
+
+def test_market_data_numpy_round_trip():
+    """Test market data converts to a structured array and back."""
+    batch = MarketDataList.validate_python([
+        {"symbol": "AAPL", "timestamp": 1700000000000000000 + i, "open": 1.0,
+         "high": 2.0, "low": 0.5, "close": 1.5 + i, "volume": 10, "vwap": vwap}
+        for i, vwap in enumerate((None, 1.25))
+    ])
+    rows = MarketData.to_numpy(batch)
+    assert rows.dtype == MARKET_DATA_DTYPE
+    assert rows["close"].mean() == 2.0
+    assert np.isnan(rows["vwap"][0])
+    assert MarketData.from_numpy("AAPL", rows) == batch
+
+
+def test_portfolio_positions_keyed_by_symbol():
+    """Test Portfolio positions are looked up by symbol and keys are checked."""
+    position = Position(
+        symbol="AAPL",
+        quantity=10,
+        average_price=150.0,
+        current_price=151.0,
+        unrealized_pnl=10.0
+    )
+    portfolio = Portfolio(
+        total_value=100000.0,
+        cash=98490.0,
+        positions={"AAPL": position},
+        total_pnl=10.0,
+        total_return=0.0
+    )
+    assert portfolio.positions["AAPL"] is position
+    with pytest.raises(ValueError):
+        Portfolio(
+            total_value=100000.0,
+            cash=98490.0,
+            positions={"MSFT": position},
+            total_pnl=10.0,
+            total_return=0.0
+        )
+
+
+def test_market_data_trusted_fast_path(now):
+    """Test trusted construction skips validation but yields an equal point."""
+    data = MarketData(
+        symbol="AAPL",
+        timestamp=1700000000000000000,
+        open=150.0,
+        high=152.0,
+        low=149.0,
+        close=151.0,
+        volume=1000000
+    )
+    trusted = MarketData.trusted(
+        symbol="AAPL",
+        timestamp_us=1700000000000000,
+        open_ticks=1500000,
+        high_ticks=1520000,
+        low_ticks=1490000,
+        close_ticks=1510000,
+        volume=1000000
+    )
+    assert trusted == data
+    assert trusted.close == 151.0
+    assert trusted.vwap is None
+    with pytest.raises(KeyError):
+        MarketData.trusted(symbol="AAPL")
+    values = dict(symbol="AAPL", side=OrderSide.BUY, order_type=OrderType.MARKET, quantity=10.0, timestamp=now)
+    assert Order.trusted(**values).model_dump() == Order(**values).model_dump()
+
+
+def test_trading_signal_missing_prices_are_nan(now):
+    """Test missing signal prices are NaN in memory and null on the wire."""
+    signal = TradingSignal(
+        symbol="AAPL",
+        timestamp=now,
+        action="HOLD",
+        confidence=0.5,
+        current_price=150.0,
+        stop_loss=None
+    )
+    assert math.isnan(signal.stop_loss)
+    assert math.isnan(signal.predicted_price)
+    assert b'"take_profit":null' in signal.to_json_bytes()
+    assert math.isnan(TradingSignal.from_json_bytes(signal.to_json_bytes()).take_profit)
+
+
+def test_market_data_unpack_batch_rejects_bad_batches():
+    """Test Arrow batches with a foreign schema or null required values are rejected."""
+    sink = pa.BufferOutputStream()
+    table = pa.table({"symbol": ["AAPL"], "close": [1.5]})
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    with pytest.raises(ValueError):
+        MarketData.unpack_batch(sink.getvalue().to_pybytes())
+    sink = pa.BufferOutputStream()
+    columns = {name: [1] for name in MARKET_DATA_ARROW_SCHEMA.names}
+    columns["symbol"] = ["AAPL"]
+    columns["close_ticks"] = [None]
+    table = pa.table(columns).cast(MARKET_DATA_ARROW_SCHEMA)
+    with pa.ipc.new_stream(sink, MARKET_DATA_ARROW_SCHEMA) as writer:
+        writer.write_table(table)
+    with pytest.raises(ValueError):
+        MarketData.unpack_batch(sink.getvalue().to_pybytes())
+
+
+def test_market_data_non_finite_prices():
+    """Test a NaN vwap is treated as missing and a NaN OHLC price is rejected."""
+    values = dict(
+        symbol="AAPL",
+        timestamp=1700000000000000000,
+        open=150.0,
+        high=152.0,
+        low=149.0,
+        close=151.0,
+        volume=1000000
+    )
+    assert MarketData(**values, vwap=math.nan).vwap is None
+    with pytest.raises(ValueError, match="close must be a finite price"):
+        MarketData(**{**values, "close": math.inf})